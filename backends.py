@@ -0,0 +1,224 @@
+"""Backends de geração de texto: Gemini, simulador local e gravação/reprodução.
+
+O backend é escolhido por variáveis de ambiente (ver `backend_from_env`):
+
+- BRIEFING_BACKEND: "gemini" (padrão quando há chave da API) ou "stub".
+- STUB_LATENCY / STUB_ERROR_RATE: latência em segundos e fração de chamadas
+  que falham com 429 no simulador.
+- BRIEFING_REPLAY: arquivo JSONL de gravações. Com BRIEFING_REPLAY_MODE=record,
+  as respostas do backend escolhido são gravadas; com "replay" (padrão), são
+  reproduzidas sem chamar nenhum modelo.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from cache import make_cache_key
+
+DEFAULT_MODEL_NAME = "gemini-1.5-flash"
+
+
+@dataclass
+class GenerationResult:
+    """Texto gerado e tokens contados pelo backend (0 quando ele não informa)"""
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+class ModelBackend:
+    """Interface comum dos backends de geração
+
+    `generation_config` segue o formato do Gemini (`max_output_tokens`,
+    `response_mime_type`). A versão assíncrona padrão roda a síncrona em uma
+    thread; backends com API assíncrona própria a sobrescrevem.
+    """
+
+    model_name = "backend"
+
+    def generate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> GenerationResult:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> GenerationResult:
+        return await asyncio.to_thread(self.generate, prompt, generation_config)
+
+
+class GeminiBackend(ModelBackend):
+    """Gemini via `google.generativeai`, importado só quando o backend é criado"""
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL_NAME):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _result(response) -> GenerationResult:
+        usage = getattr(response, "usage_metadata", None)
+        return GenerationResult(
+            text=response.text,
+            input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+        )
+
+    def generate(self, prompt, generation_config=None):
+        return self._result(self._model.generate_content(prompt, generation_config=generation_config))
+
+    async def agenerate(self, prompt, generation_config=None):
+        return self._result(await self._model.generate_content_async(prompt, generation_config=generation_config))
+
+
+class StubRateLimitError(Exception):
+    """Imita o erro de cota excedida devolvido pela API"""
+
+    code = 429
+
+
+class StubBackend(ModelBackend):
+    """Simulador determinístico com latência artificial e injeção de erros 429
+
+    O texto depende só do prompt; com `seed`, a sequência de erros também é
+    reproduzível. `jitter` sorteia a latência entre `latency` e `latency + jitter`.
+    """
+
+    def __init__(self, latency: float = 0.5, error_rate: float = 0.0, jitter: float = 0.0,
+                 seed: Optional[int] = None, model_name: str = "stub-model"):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self.model_name = model_name
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _start_call(self):
+        """Conta a chamada e sorteia a latência e se ela vai falhar com 429"""
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+        return fail, delay
+
+    def _respond(self, prompt: str, fail: bool, generation_config: Optional[Dict[str, Any]]) -> GenerationResult:
+        if fail:
+            raise StubRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        text = f"Texto simulado ({digest}) para um prompt de {len(prompt)} caracteres."
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            text = json.dumps({"contexto": text, "estrategia": text}, ensure_ascii=False)
+        return GenerationResult(text=text)
+
+    def generate(self, prompt, generation_config=None):
+        fail, delay = self._start_call()
+        time.sleep(delay)
+        return self._respond(prompt, fail, generation_config)
+
+    async def agenerate(self, prompt, generation_config=None):
+        fail, delay = self._start_call()
+        await asyncio.sleep(delay)
+        return self._respond(prompt, fail, generation_config)
+
+
+class ReplayMissError(KeyError):
+    """O prompt não está entre as respostas gravadas"""
+
+
+class ReplayBackend(ModelBackend):
+    """Grava as respostas de outro backend em JSONL, ou as reproduz sem chamar modelo
+
+    Com `inner`, cada resposta de `inner` é acrescentada ao arquivo (gravação).
+    Sem `inner`, só as respostas gravadas são devolvidas, e um prompt novo
+    levanta `ReplayMissError`. A chave de cada gravação inclui o modelo e a
+    configuração de geração, como no cache de respostas.
+    """
+
+    def __init__(self, path: str, inner: Optional[ModelBackend] = None):
+        self.path = path
+        self.inner = inner
+        self.model_name = inner.model_name if inner else "replay"
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as records:
+                for line in records:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._records[record["chave"]] = record
+            if inner is None and self._records:
+                self.model_name = next(iter(self._records.values()))["modelo"]
+
+    def _key(self, prompt: str, generation_config: Optional[Dict[str, Any]]) -> str:
+        config = json.dumps(generation_config or {}, sort_keys=True)
+        return make_cache_key(f"{self.model_name}\0{config}", prompt)
+
+    def _lookup(self, key: str) -> GenerationResult:
+        record = self._records.get(key)
+        if record is None:
+            raise ReplayMissError(f"Resposta não gravada em {self.path} (chave {key[:12]})")
+        return GenerationResult(record["texto"], record["tokens_entrada"], record["tokens_saida"])
+
+    def _record(self, key: str, result: GenerationResult) -> GenerationResult:
+        record = {
+            "chave": key,
+            "modelo": self.model_name,
+            "texto": result.text,
+            "tokens_entrada": result.input_tokens,
+            "tokens_saida": result.output_tokens,
+        }
+        with self._lock:
+            if key not in self._records:
+                self._records[key] = record
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as records:
+                    records.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return result
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def generate(self, prompt, generation_config=None):
+        key = self._key(prompt, generation_config)
+        if self.inner is None:
+            return self._lookup(key)
+        return self._record(key, self.inner.generate(prompt, generation_config))
+
+    async def agenerate(self, prompt, generation_config=None):
+        key = self._key(prompt, generation_config)
+        if self.inner is None:
+            return self._lookup(key)
+        return self._record(key, await self.inner.agenerate(prompt, generation_config))
+
+
+def backend_from_env(api_key: Optional[str] = None, model_name: str = DEFAULT_MODEL_NAME) -> Optional[ModelBackend]:
+    """Cria o backend descrito pelas variáveis de ambiente; None se nenhum estiver disponível"""
+    stub_latency = os.getenv("STUB_LATENCY")
+    kind = os.getenv("BRIEFING_BACKEND") or ("stub" if stub_latency else "gemini")
+
+    if kind == "stub":
+        backend: Optional[ModelBackend] = StubBackend(
+            latency=float(stub_latency or 0.5),
+            error_rate=float(os.getenv("STUB_ERROR_RATE") or 0),
+        )
+    elif kind == "gemini":
+        backend = GeminiBackend(api_key, model_name) if api_key else None
+    else:
+        raise ValueError(f"BRIEFING_BACKEND desconhecido: {kind}")
+
+    replay_path = os.getenv("BRIEFING_REPLAY")
+    if replay_path:
+        if os.getenv("BRIEFING_REPLAY_MODE", "replay") == "record":
+            return ReplayBackend(replay_path, inner=backend) if backend else None
+        return ReplayBackend(replay_path)
+    return backend
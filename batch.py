@@ -0,0 +1,266 @@
+"""Execução concorrente do processamento em lote de briefings."""
+import asyncio
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# Número padrão de linhas do calendário processadas ao mesmo tempo
+DEFAULT_MAX_WORKERS = 4
+# Quantas vezes uma linha que falhou volta para a fila antes de ser desistida
+DEFAULT_MAX_REQUEUES = 2
+
+
+def run_concurrently(*tasks: Callable[[], Any]) -> List[Any]:
+    """Executa as tarefas em paralelo e devolve os resultados na ordem recebida"""
+    if len(tasks) <= 1:
+        return [task() for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [executor.submit(task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def group_duplicates(items: Iterable[Any], key: Callable[[Any], Hashable]) -> List[List[Any]]:
+    """Agrupa itens com a mesma chave, mantendo a ordem da primeira ocorrência de cada grupo"""
+    groups: Dict[Hashable, List[Any]] = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return list(groups.values())
+
+
+def iter_batch(
+    items: Iterable[Any],
+    worker: Callable[[Any], Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    return_exceptions: bool = False,
+) -> Iterator[Tuple[int, Any]]:
+    """Processa os itens com até `max_workers` em paralelo.
+
+    Gera tuplas (posição, resultado) à medida que cada item termina. Os itens
+    são consumidos aos poucos, mantendo no máximo o dobro de `max_workers`
+    tarefas na fila do executor. Com `return_exceptions`, o erro de um item é
+    devolvido no lugar do resultado em vez de interromper o lote.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers deve ser pelo menos 1")
+
+    iterator = iter(items)
+    pending = {}
+    position = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit_next() -> bool:
+            nonlocal position
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return False
+            pending[executor.submit(worker, item)] = position
+            position += 1
+            return True
+
+        try:
+            for _ in range(max_workers * 2):
+                if not submit_next():
+                    break
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    submit_next()
+                    error = future.exception()
+                    if error is not None and not return_exceptions:
+                        raise error
+                    yield index, error if error is not None else future.result()
+        finally:
+            # Em caso de erro ou interrupção, não inicia o que ainda está na fila
+            for future in pending:
+                future.cancel()
+
+
+class _BatchState:
+    """Resultados, erros e fila de novas tentativas compartilhados pelas versões síncrona e assíncrona"""
+
+    def __init__(self, items: List[Any], max_requeues: int, on_progress: Optional[Callable[[int, int], None]]):
+        self.items = items
+        self.total = len(items)
+        self.results: List[Any] = [None] * self.total
+        self.errors: Dict[int, Exception] = {}
+        self.completed = 0
+        self.max_requeues = max_requeues
+        self.on_progress = on_progress
+        self.queue = list(range(self.total))
+        self.requeued: List[int] = []
+
+    def rounds(self) -> Iterator[bool]:
+        """Gera uma rodada por tentativa, indicando se é a última"""
+        for attempt in range(self.max_requeues + 1):
+            self.requeued = []
+            yield attempt == self.max_requeues
+            if not self.requeued:
+                break
+            self.queue = sorted(self.requeued)
+
+    def record(self, position: int, result: Any, last_round: bool) -> None:
+        if isinstance(result, Exception):
+            self.errors[position] = result
+            if not last_round:
+                self.requeued.append(position)
+                return
+        else:
+            self.results[position] = result
+            self.errors.pop(position, None)
+        self.completed += 1
+        if self.on_progress:
+            self.on_progress(self.completed, self.total)
+
+    def outcome(self) -> Tuple[List[Any], List[Tuple[Any, Exception]]]:
+        failures = [(self.items[position], self.errors[position]) for position in sorted(self.errors)]
+        return self.results, failures
+
+
+def run_batch(
+    items: List[Any],
+    worker: Callable[[Any], Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    max_requeues: int = DEFAULT_MAX_REQUEUES,
+    cancel_event: Optional[threading.Event] = None,
+) -> Tuple[List[Any], List[Tuple[Any, Exception]]]:
+    """Processa todos os itens em paralelo e devolve os resultados na ordem original.
+
+    Itens que falham voltam para o fim da fila até `max_requeues` vezes; os que
+    continuam falhando ficam com resultado None e são listados em `falhas` junto
+    com o último erro. `on_progress(concluidos, total)` é chamado na thread de
+    quem chamou a função sempre que um item termina, o que permite atualizar
+    widgets do Streamlit. Se `cancel_event` for acionado, nenhum item novo é
+    iniciado e os que não terminaram ficam com resultado None.
+    """
+    state = _BatchState(items, max_requeues, on_progress)
+
+    for last_round in state.rounds():
+        round_items = [items[position] for position in state.queue]
+        for index, result in iter_batch(round_items, worker, max_workers, return_exceptions=True):
+            state.record(state.queue[index], result, last_round)
+            if cancel_event is not None and cancel_event.is_set():
+                return state.outcome()
+
+    return state.outcome()
+
+
+async def arun_batch(
+    items: List[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    max_concurrency: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    max_requeues: int = DEFAULT_MAX_REQUEUES,
+    cancel_event: Optional[threading.Event] = None,
+) -> Tuple[List[Any], List[Tuple[Any, Exception]]]:
+    """Versão assíncrona de `run_batch`, com até `max_concurrency` itens em andamento
+
+    Ao acionar `cancel_event` (ou cancelar a própria corrotina), as tarefas em
+    andamento são canceladas e aguardadas antes de retornar.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency deve ser pelo menos 1")
+
+    state = _BatchState(items, max_requeues, on_progress)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(position: int) -> Any:
+        async with semaphore:
+            return await worker(items[position])
+
+    for last_round in state.rounds():
+        tasks = {asyncio.ensure_future(run_one(position)): position for position in state.queue}
+        pending = set(tasks)
+        try:
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    return state.outcome()
+                done, pending = await asyncio.wait(pending, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    state.record(tasks[task], error if error is not None else task.result(), last_round)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    return state.outcome()
+
+
+# Laço de eventos único do processo, rodando em uma thread própria. Clientes
+# assíncronos (como o do Gemini) ficam presos ao laço em que foram criados,
+# então todas as corrotinas do app rodam sempre no mesmo.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Laço de eventos compartilhado, iniciado na primeira chamada"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="briefing-event-loop", daemon=True).start()
+        return _loop
+
+
+def run_coroutine(coroutine: Coroutine) -> Any:
+    """Executa a corrotina no laço compartilhado e espera o resultado"""
+    future = asyncio.run_coroutine_threadsafe(coroutine, get_event_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def run_async_batch(
+    items: List[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    max_concurrency: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    max_requeues: int = DEFAULT_MAX_REQUEUES,
+    cancel_event: Optional[threading.Event] = None,
+) -> Tuple[List[Any], List[Tuple[Any, Exception]]]:
+    """Executa `arun_batch` no laço compartilhado a partir de código síncrono
+
+    O progresso é repassado para a thread de quem chamou, como em `run_batch`.
+    Se essa thread for interrompida (por exemplo, por um rerun do Streamlit ou
+    Ctrl+C), o lote é cancelado antes de a exceção seguir adiante.
+    """
+    cancel_event = cancel_event or threading.Event()
+    progress: "queue.Queue[Tuple[int, int]]" = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        arun_batch(items, worker, max_concurrency, lambda done, total: progress.put((done, total)),
+                   max_requeues, cancel_event),
+        get_event_loop(),
+    )
+
+    def drain_progress() -> None:
+        while True:
+            try:
+                done, total = progress.get_nowait()
+            except queue.Empty:
+                return
+            if on_progress:
+                on_progress(done, total)
+
+    try:
+        while not future.done():
+            try:
+                future.result(timeout=0.1)
+            except FutureTimeoutError:
+                pass
+            drain_progress()
+        drain_progress()
+        return future.result()
+    except BaseException:
+        cancel_event.set()
+        future.cancel()
+        raise
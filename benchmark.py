@@ -0,0 +1,135 @@
+"""Benchmark do processamento em lote com calendários sintéticos
+
+Roda calendários de vários tamanhos pelo pipeline completo (leitura do CSV,
+extração, geração, diário e ZIP) usando o simulador local (`StubBackend`),
+sem cache de respostas e com limites de cota altos. Para cada tamanho e modo
+mostra vazão, percentis de latência por briefing e pico de memória:
+
+    python benchmark.py --linhas 10 100 1000 5000 --modos threads async --latencia 0.05
+
+Com --json, grava os resultados para comparar execuções e encontrar regressões.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+# O core lê o diretório de cache ao ser importado; cada benchmark usa um diretório novo,
+# mesmo com BRIEFING_CACHE_DIR definida, para não alterar a cota nem o diário da instalação
+os.environ["BRIEFING_CACHE_DIR"] = tempfile.mkdtemp(prefix="briefing-bench-")
+
+import core  # noqa: E402
+from backends import StubBackend  # noqa: E402
+from metrics import metrics  # noqa: E402
+
+# Todos estão no catálogo, para que cada linha sintética seja processada
+PRODUTOS = ["megafol", "verdavis", "engeo pleno s", "miravis duo", "certano", "fortenza"]
+CULTURAS = ["soja", "milho", "algodão", "café", "trigo"]
+MODOS = ("threads", "async")
+
+
+def synthetic_csv(linhas: int, rodada: str = "") -> bytes:
+    """CSV de calendário com `linhas` conteúdos distintos (sem duplicatas)
+
+    `rodada` entra no texto de cada linha para que rodadas diferentes não
+    reaproveitem o lote umas das outras.
+    """
+    registros = ["conteudo", "cabecalho"]
+    for i in range(linhas):
+        produto = PRODUTOS[i % len(PRODUTOS)]
+        cultura = CULTURAS[(i // len(PRODUTOS)) % len(CULTURAS)]
+        registros.append(f"{produto} - {cultura} - post {i} {rodada}".strip())
+    return ("\n".join(registros) + "\n").encode("utf-8")
+
+
+def run_once(linhas: int, modo: str, concorrencia: int, combinado: bool) -> dict:
+    """Processa um calendário sintético e devolve as medidas da rodada"""
+    file_bytes = synthetic_csv(linhas, rodada=f"{modo}-{concorrencia}-{time.time_ns()}")
+    metrics.reset()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        relatorio = core.process_calendar(
+            file_bytes,
+            "benchmark.csv",
+            "conteudo",
+            date.today(),
+            core.FORMATOS[0],
+            combined=combinado,
+            max_workers=concorrencia,
+            use_async=modo == "async",
+        )
+        tempo = time.perf_counter() - inicio
+        _, pico_memoria = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    etapas = metrics.snapshot()["etapas"]
+    briefing = etapas.get("briefing", {})
+    modelo = etapas.get("modelo", {})
+    return {
+        "linhas": linhas,
+        "modo": modo,
+        "concorrencia": concorrencia,
+        "briefings": relatorio.novos,
+        "falhas": len(relatorio.falhas),
+        "tempo_s": tempo,
+        "briefings_por_s": relatorio.novos / tempo if tempo else 0.0,
+        "briefing_p50_s": briefing.get("p50", 0.0),
+        "briefing_p95_s": briefing.get("p95", 0.0),
+        "briefing_p99_s": briefing.get("p99", 0.0),
+        "modelo_p95_s": modelo.get("p95", 0.0),
+        "pico_memoria_mb": pico_memoria / 1024 / 1024,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="Tamanhos dos calendários sintéticos")
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS), help="Backends de execução")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Linhas em andamento ao mesmo tempo")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência simulada por chamada, em segundos")
+    parser.add_argument("--variacao", type=float, default=0.0, help="Variação aleatória somada à latência")
+    parser.add_argument("--taxa-erros", type=float, default=0.0, help="Fração das chamadas que falham com 429")
+    parser.add_argument("--combinado", action="store_true", help="Uma chamada por linha em vez de duas")
+    parser.add_argument("--json", help="Arquivo onde gravar os resultados")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    core.configure_backend(backend=StubBackend(
+        latency=args.latencia, error_rate=args.taxa_erros, jitter=args.variacao, seed=0
+    ))
+    core.set_use_cache(False)
+    scheduler = core.get_scheduler()
+    scheduler.update_limits(1_000_000, 1_000_000_000)
+    # Os erros simulados são repetidos sem esperar, para medir só o pipeline
+    scheduler.base_delay = 0.0
+
+    cabecalho = (f"{'linhas':>7} {'modo':<8} {'tempo (s)':>10} {'briefings/s':>12} "
+                 f"{'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'memória (MB)':>13} {'falhas':>7}")
+    print(cabecalho)
+    resultados = []
+    for linhas in args.linhas:
+        for modo in args.modos:
+            resultado = run_once(linhas, modo, args.concorrencia, args.combinado)
+            resultados.append(resultado)
+            print(f"{linhas:>7} {modo:<8} {resultado['tempo_s']:>10.2f} {resultado['briefings_por_s']:>12.1f} "
+                  f"{resultado['briefing_p50_s']:>8.3f} {resultado['briefing_p95_s']:>8.3f} "
+                  f"{resultado['briefing_p99_s']:>8.3f} {resultado['pico_memoria_mb']:>13.1f} "
+                  f"{resultado['falhas']:>7}", flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as saida:
+            json.dump({"parametros": vars(args), "resultados": resultados}, saida, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Cache persistente das respostas do modelo, endereçado pelo conteúdo do prompt."""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+# Validade padrão de uma resposta em cache (7 dias)
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+# Tamanho máximo do cache em disco antes de descartar as entradas menos usadas
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# Quantidade de respostas mantidas também em memória
+DEFAULT_MEMORY_ITEMS = 512
+
+
+def make_cache_key(model_name: str, prompt: str) -> str:
+    """Gera a chave do cache a partir do nome do modelo e do prompt completo"""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """Cache em duas camadas (memória + SQLite) com TTL e descarte LRU por tamanho"""
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        memory_items: int = DEFAULT_MEMORY_ITEMS,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # O cache é dividido entre o app e os workers da fila, em processos diferentes
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                texto TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (acessado_em)")
+        self._conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, text: str, created_at: float) -> None:
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Busca uma resposta no cache, primeiro em memória e depois em disco"""
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and not self._expired(cached[1], now):
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return cached[0]
+            self._memory.pop(key, None)
+
+            row = self._conn.execute(
+                "SELECT texto, criado_em FROM respostas WHERE chave = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            text, created_at = row
+            if self._expired(created_at, now):
+                self._conn.execute("DELETE FROM respostas WHERE chave = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, text, created_at)
+            self.hits_disk += 1
+            return text
+
+    def set(self, key: str, text: str) -> None:
+        """Grava uma resposta e descarta as menos usadas se o limite de tamanho for excedido"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respostas (chave, texto, tamanho, criado_em, acessado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), now, now),
+            )
+            self._remember(key, text, now)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT chave, tamanho FROM respostas ORDER BY acessado_em")
+        removidas = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            removidas.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+        for (key,) in removidas:
+            self._memory.pop(key, None)
+
+    def contains(self, model_name: str, prompt: str) -> bool:
+        """Indica se há resposta válida para o prompt, sem alterar contadores nem a ordem LRU"""
+        key = make_cache_key(model_name, prompt)
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and not self._expired(cached[1], now):
+                return True
+            row = self._conn.execute("SELECT criado_em FROM respostas WHERE chave = ?", (key,)).fetchone()
+        return row is not None and not self._expired(row[0], now)
+
+    def get_or_generate(
+        self,
+        model_name: str,
+        prompt: str,
+        generate: Callable[[], str],
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """Devolve a resposta em cache ou chama `generate` e guarda o resultado
+
+        Se `validate` for informado, só respostas aprovadas por ele são guardadas.
+        """
+        key = make_cache_key(model_name, prompt)
+        text = self.get(key)
+        if text is None:
+            text = generate()
+            if validate is None or validate(text):
+                self._store(key, text)
+        return text
+
+    def _store(self, key: str, text: str) -> None:
+        # Uma resposta já paga nunca é perdida por falha ao gravá-la no cache
+        try:
+            self.set(key, text)
+        except sqlite3.Error:
+            with self._lock:
+                self._conn.rollback()
+
+    async def aget_or_generate(
+        self,
+        model_name: str,
+        prompt: str,
+        generate: Callable[[], Awaitable[str]],
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """Versão assíncrona de `get_or_generate`
+
+        A leitura e a gravação no SQLite rodam em uma thread, para a espera pelo
+        lock do arquivo não travar as outras corrotinas do laço de eventos.
+        """
+        key = make_cache_key(model_name, prompt)
+        text = await asyncio.to_thread(self.get, key)
+        if text is None:
+            text = await generate()
+            if validate is None or validate(text):
+                await asyncio.to_thread(self._store, key, text)
+        return text
+
+    def clear(self) -> None:
+        """Remove todas as respostas do cache"""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM respostas")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de acertos e falhas desde que o cache foi aberto"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+            ).fetchone()
+        return {
+            "hits_memoria": self.hits_memory,
+            "hits_disco": self.hits_disk,
+            "misses": self.misses,
+            "entradas": entries,
+            "bytes": size,
+        }
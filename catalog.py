@@ -0,0 +1,187 @@
+"""Catálogo de produtos lido de um arquivo JSON, com apelidos, busca aproximada e recarga automática."""
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set
+
+from matcher import ProductMatcher, normalize_text
+from prompts import compact, truncate_tokens
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog", "produtos.json")
+
+# Descrição usada nos prompts quando o produto não está no catálogo
+DEFAULT_DESCRIPTION = "Produto agrícola Syngenta"
+# Tamanho máximo da descrição embutida em cada prompt
+FRAGMENT_MAX_TOKENS = 120
+# Intervalo mínimo entre verificações de alteração do arquivo, em segundos
+RELOAD_CHECK_INTERVAL = 1.0
+# Termos mais curtos que isso só são reconhecidos com a grafia exata
+FUZZY_MIN_LENGTH = 4
+# Separadores entre produto, cultura e ação nas células do calendário
+SEGMENT_SEPARATORS = re.compile(r"\s+[-–—|:]\s+|[|:]")
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigramas do texto normalizado, com bordas marcadas"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Distância de Levenshtein, interrompida assim que passa de `limit`"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def interior_edit(a: str, b: str) -> bool:
+    """Indica se a diferença entre os termos fica no meio da palavra, e não nas pontas
+
+    Erros de digitação trocam, omitem ou repetem letras no meio do nome
+    ("megafl", "verdadro"); diferenças no início ou no fim são típicas de
+    palavras comuns parecidas com o nome ("ponta", "alado", "influxo").
+    """
+    prefix = 0
+    while prefix < min(len(a), len(b)) and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(a), len(b)) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    return prefix > 0 and suffix > 0
+
+
+def max_typos(term: str) -> int:
+    """Erros de digitação tolerados para um termo desse tamanho"""
+    return 1 if len(term) < 8 else 2
+
+
+class ProductCatalog:
+    """Produtos do catálogo indexados por nome, apelidos e trigramas
+
+    O arquivo JSON tem a forma {"produtos": [{"nome", "descricao", "aliases"}]}.
+    Cada produto guarda o fragmento de prompt já compactado, e nomes com erro
+    de digitação são resolvidos pela distância de edição entre os candidatos
+    que compartilham trigramas (ver `interior_edit`). Alterações no arquivo
+    são recarregadas na próxima consulta, sem reiniciar o servidor.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as catalog_file:
+            produtos = json.load(catalog_file)["produtos"]
+
+        descriptions: Dict[str, str] = {}
+        fragments: Dict[str, str] = {}
+        aliases: Dict[str, str] = {}
+        for produto in produtos:
+            nome = produto["nome"]
+            descriptions[nome] = produto.get("descricao", "")
+            fragments[nome] = truncate_tokens(compact(descriptions[nome]), FRAGMENT_MAX_TOKENS) or DEFAULT_DESCRIPTION
+            for termo in [nome, *produto.get("aliases", [])]:
+                aliases[normalize_text(termo)] = nome
+
+        index: Dict[str, List[str]] = {}
+        for termo in aliases:
+            for trigram in trigrams(termo):
+                index.setdefault(trigram, []).append(termo)
+
+        with self._lock:
+            self._mtime = os.path.getmtime(self.path)
+            self.descriptions = descriptions
+            self._fragments = fragments
+            self._aliases = aliases
+            self._index = index
+            self._resolved: Dict[str, Optional[str]] = {}
+            self.matcher = ProductMatcher(descriptions, product_aliases=aliases, fuzzy=self.fuzzy_match)
+            self.version = self._mtime
+
+    def reload_if_changed(self) -> bool:
+        """Recarrega o catálogo se o arquivo mudou; consulta o disco no máximo uma vez por segundo"""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        try:
+            changed = os.path.getmtime(self.path) != self._mtime
+        except FileNotFoundError:
+            return False
+        if changed:
+            # Um arquivo com erro mantém o catálogo anterior até ser corrigido
+            try:
+                self._load()
+            except (OSError, ValueError, KeyError):
+                return False
+        return changed
+
+    def __contains__(self, product: str) -> bool:
+        return product in self.descriptions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.descriptions)
+
+    def __len__(self) -> int:
+        return len(self.descriptions)
+
+    def description(self, product: str, default: str = "Descrição do produto não disponível.") -> str:
+        return self.descriptions.get(product) or default
+
+    def prompt_fragment(self, product: str) -> str:
+        """Descrição compacta do produto, pronta para entrar no prompt"""
+        return self._fragments.get(product, DEFAULT_DESCRIPTION)
+
+    def resolve(self, term: str) -> Optional[str]:
+        """Nome oficial do produto para um nome ou apelido, tolerando erros de digitação"""
+        normalized = normalize_text(term)
+        resolved = self._resolved.get(normalized)
+        if resolved is not None or normalized in self._resolved:
+            return resolved
+
+        resolved = self._aliases.get(normalized)
+        if resolved is None and len(normalized) >= FUZZY_MIN_LENGTH:
+            candidates: Dict[str, int] = {}
+            for trigram in trigrams(normalized):
+                for candidate in self._index.get(trigram, ()):
+                    candidates[candidate] = candidates.get(candidate, 0) + 1
+            best_distance = max_typos(normalized) + 1
+            # Só compara a distância de edição com os candidatos que mais compartilham trigramas
+            for candidate in sorted(candidates, key=candidates.get, reverse=True)[:10]:
+                # A tolerância é a do termo mais curto, para não aproximar palavras comuns de nomes curtos
+                limit = min(max_typos(normalized), max_typos(candidate))
+                if not interior_edit(normalized, candidate):
+                    continue
+                distance = edit_distance(normalized, candidate, limit)
+                if distance <= limit and distance < best_distance:
+                    best_distance, resolved = distance, self._aliases[candidate]
+
+        # Memoriza também os termos não encontrados, que se repetem muito em um calendário
+        if len(self._resolved) < 100_000:
+            self._resolved[normalized] = resolved
+        return resolved
+
+    def fuzzy_match(self, text: str) -> Optional[str]:
+        """Procura um produto com erro de digitação no início da célula
+
+        As células seguem o padrão PRODUTO - CULTURA - AÇÃO, então só o primeiro
+        trecho é comparado, e sempre inteiro: palavras soltas de uma frase
+        ("verdadeiros resultados", "influxo de pragas") não viram produto.
+        """
+        segment = normalize_text(SEGMENT_SEPARATORS.split(str(text), maxsplit=1)[0])
+        if not segment:
+            return None
+        return self.resolve(segment)
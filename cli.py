@@ -0,0 +1,130 @@
+"""Geração de briefings em lote pela linha de comando, sem o Streamlit.
+
+Exemplo:
+    python cli.py calendario.csv --coluna "Conteúdo" --data 2025-09-01 \
+        --formato "Reels + capa" --saida briefings.zip
+"""
+import argparse
+import io
+import os
+import sys
+import zipfile
+from datetime import datetime
+
+import core
+from batch import DEFAULT_MAX_WORKERS
+from streaming import read_csv_preview
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera briefings no padrão SYN a partir de um calendário em CSV.")
+    parser.add_argument("csv", help="Arquivo CSV exportado do Google Sheets")
+    parser.add_argument("--coluna", required=True, help="Coluna com o conteúdo das células do calendário")
+    parser.add_argument("--data", default=datetime.now().strftime("%Y-%m-%d"),
+                        help="Data prevista dos briefings (AAAA-MM-DD); padrão: hoje")
+    parser.add_argument("--formato", default=core.FORMATOS[0], choices=core.FORMATOS, help="Formato principal")
+    parser.add_argument("--saida", required=True,
+                        help="Arquivo .zip ou diretório onde os briefings serão gravados")
+    parser.add_argument("--concorrencia", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Linhas processadas simultaneamente")
+    parser.add_argument("--combinado", action="store_true",
+                        help="Gera contexto e estratégia em uma única chamada ao modelo")
+    parser.add_argument("--assincrono", action="store_true",
+                        help="Usa a API assíncrona do modelo; --concorrencia vira o número de linhas em andamento")
+    parser.add_argument("--rpm", type=float, help="Limite de requisições por minuto")
+    parser.add_argument("--tpm", type=float, help="Limite de tokens por minuto")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usa o cache de respostas do modelo")
+    parser.add_argument("--simular", action="store_true",
+                        help="Apenas estima chamadas, tokens e tempo, sem chamar o modelo")
+    return parser.parse_args(argv)
+
+
+def write_output(zip_path: str, saida: str) -> None:
+    """Copia o ZIP do lote para `saida`, ou extrai os briefings se `saida` for um diretório"""
+    if saida.lower().endswith(".zip"):
+        directory = os.path.dirname(saida)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(zip_path, "rb") as origem, open(saida, "wb") as destino:
+            while True:
+                bloco = origem.read(1024 * 1024)
+                if not bloco:
+                    break
+                destino.write(bloco)
+    else:
+        os.makedirs(saida, exist_ok=True)
+        with zipfile.ZipFile(zip_path) as zip_file:
+            zip_file.extractall(saida)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    data_input = datetime.strptime(args.data, "%Y-%m-%d").date()
+
+    if core.configure_backend() is None and not args.simular:
+        print("Erro: defina GEMINI_API_KEY (ou BRIEFING_BACKEND=stub para o simulador local).", file=sys.stderr)
+        return 2
+
+    core.set_use_cache(not args.sem_cache)
+    core.get_scheduler().update_limits(args.rpm, args.tpm)
+
+    try:
+        with open(args.csv, "rb") as csv_file:
+            file_bytes = csv_file.read()
+        colunas = read_csv_preview(io.BytesIO(file_bytes), nrows=0).columns
+    except OSError as e:
+        print(f"Erro: não foi possível ler {args.csv}: {e.strerror or e}.", file=sys.stderr)
+        return 2
+    except ValueError as e:
+        print(f"Erro: {args.csv} não é um CSV válido: {e}", file=sys.stderr)
+        return 2
+    if args.coluna not in colunas:
+        print(f"Erro: a coluna {args.coluna!r} não existe em {args.csv}; colunas: {', '.join(map(str, colunas))}.",
+              file=sys.stderr)
+        return 2
+
+    if args.simular:
+        plano = core.plan_calendar(
+            file_bytes, args.coluna, data_input, args.formato,
+            combined=args.combinado, max_workers=args.concorrencia,
+        )
+        print(f"Linhas com produto: {plano.linhas_com_produto} (sem produto: {plano.linhas_sem_produto}, "
+              f"já concluídas: {plano.linhas_ja_concluidas}, duplicadas: {plano.linhas_duplicadas})")
+        print(f"Chamadas ao modelo: {plano.chamadas_ao_modelo} (em cache: {plano.chamadas_em_cache})")
+        print(f"Tokens de entrada: {plano.tokens_entrada_total}")
+        print(f"Tempo estimado: {plano.tempo_estimado_s / 60:.1f} min (limite dominante: {plano.gargalo or '-'})")
+        return 0
+
+    def mostrar_progresso(concluidos, total, zip_saida):
+        print(f"\rBriefing único {concluidos} de {total} gerado...", end="", file=sys.stderr, flush=True)
+
+    relatorio = core.process_calendar(
+        file_bytes,
+        os.path.basename(args.csv),
+        args.coluna,
+        data_input,
+        args.formato,
+        combined=args.combinado,
+        max_workers=args.concorrencia,
+        on_progress=mostrar_progresso,
+        use_async=args.assincrono,
+    )
+    print(file=sys.stderr)
+
+    write_output(relatorio.zip_path, args.saida)
+    print(f"Lote {relatorio.job_id}: {len(relatorio.briefings)} briefings gravados em {args.saida} "
+          f"({relatorio.novos} novos, {relatorio.reaproveitados} reaproveitados, "
+          f"{relatorio.linhas_duplicadas} linhas duplicadas).")
+    alteracoes = relatorio.alteracoes
+    if alteracoes.get("lote_anterior"):
+        print(f"Em relação ao lote {alteracoes['lote_anterior']}: {len(alteracoes['nova'])} linhas novas, "
+              f"{len(alteracoes['alterada'])} alteradas, {len(alteracoes['inalterada'])} inalteradas e "
+              f"{len(alteracoes['removida'])} removidas (detalhes em alteracoes.csv).")
+
+    for linha, erro in relatorio.falhas:
+        print(f"Falha na linha {linha[0] + 1}: {erro}", file=sys.stderr)
+    return 1 if relatorio.falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
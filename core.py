@@ -0,0 +1,899 @@
+"""Núcleo do gerador de briefings, sem dependência do Streamlit.
+
+Usado pela interface (main.py) e pela linha de comando (cli.py). Os recursos
+compartilhados (backend de geração, cache, agendador, diário de lotes) são criados sob
+demanda e reaproveitados por todo o processo.
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backends import DEFAULT_MODEL_NAME, GenerationResult, ModelBackend, backend_from_env
+from batch import DEFAULT_MAX_WORKERS, group_duplicates, run_async_batch, run_batch, run_concurrently
+from cache import LLMCache
+from catalog import DEFAULT_CATALOG_PATH, ProductCatalog
+from job_queue import JobQueue
+from jobs import ALTERADA, INALTERADA, NOVA, REMOVIDA, JobJournal, compare_manifests, fingerprint_job, fingerprint_row
+from matcher import ProductMatcher, normalize_text
+from metrics import metrics
+from planner import DEFAULT_CALL_LATENCY, BatchPlan, plan_batch
+from prompts import (
+    COMBINED_TEMPLATE,
+    CONTEXT_TEMPLATE,
+    PROMPT_VERSION,
+    STRATEGY_TEMPLATE,
+    generation_config,
+    platforms_for_format,
+    render,
+)
+from scheduler import (
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+    RequestScheduler,
+    estimate_tokens,
+)
+from streaming import IncrementalZip, iter_csv_chunks
+
+MODEL_NAME = os.getenv("GEMINI_MODEL", DEFAULT_MODEL_NAME)
+CACHE_DIR = os.getenv("BRIEFING_CACHE_DIR", ".cache")
+# Catálogo de produtos (descrições e apelidos), recarregado quando o arquivo muda
+CATALOG_PATH = os.getenv("BRIEFING_CATALOG", DEFAULT_CATALOG_PATH)
+
+FORMATOS = ["Reels + capa", "Carrossel + stories", "Blog + redes", "Vídeo + stories", "Multiplataforma"]
+DIAS_SEMANA = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+# Recursos compartilhados pelo processo, criados na primeira vez em que são usados
+_resources: Dict[str, Any] = {}
+_resources_lock = threading.RLock()
+_settings = {"api_key": None, "use_cache": True}
+
+
+def _shared(name: str, factory: Callable[[], Any]) -> Any:
+    with _resources_lock:
+        if name not in _resources:
+            _resources[name] = factory()
+        return _resources[name]
+
+
+def configure_backend(api_key: Optional[str] = None, backend: Optional[ModelBackend] = None) -> Optional[ModelBackend]:
+    """Configura o backend de geração; sem chave, usa a variável de ambiente GEMINI_API_KEY
+
+    Sem `backend`, ele é escolhido pelas variáveis de ambiente (ver `backends`)
+    e só é recriado se a chave mudar. Devolve None se nenhum estiver disponível.
+    """
+    with _resources_lock:
+        if backend is not None:
+            _settings["api_key"] = None
+            _resources["backend"] = backend
+            return backend
+
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if "backend" in _resources and _settings["api_key"] == api_key:
+            return _resources["backend"]
+
+        _settings["api_key"] = api_key
+        _resources["backend"] = backend_from_env(api_key, MODEL_NAME)
+        return _resources["backend"]
+
+
+def get_backend() -> Optional[ModelBackend]:
+    """Backend de geração configurado (ou None se não houver chave da API)"""
+    with _resources_lock:
+        if "backend" in _resources:
+            return _resources["backend"]
+    return configure_backend()
+
+
+def set_use_cache(use_cache: bool) -> None:
+    """Liga ou desliga o uso do cache de respostas do modelo"""
+    _settings["use_cache"] = use_cache
+
+
+def get_llm_cache() -> LLMCache:
+    """Cache de respostas compartilhado pelo processo"""
+    def create():
+        llm_cache = LLMCache(os.path.join(CACHE_DIR, "llm_cache.sqlite3"))
+        metrics.register_collector("cache", llm_cache.stats, gauges=("entradas", "bytes"))
+        return llm_cache
+    return _shared("llm_cache", create)
+
+
+def get_scheduler() -> RequestScheduler:
+    """Agendador único para todas as chamadas ao modelo, compartilhando a mesma cota
+
+    A cota fica em um arquivo SQLite, dividida entre o app, a linha de comando
+    e os workers da fila que usam o mesmo diretório de cache. GEMINI_RPM e
+    GEMINI_TPM, quando definidas, substituem os limites gravados.
+    """
+    def create():
+        scheduler = RequestScheduler(
+            requests_per_minute=float(os.getenv("GEMINI_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+            tokens_per_minute=float(os.getenv("GEMINI_TPM", DEFAULT_TOKENS_PER_MINUTE)),
+            shared_state_path=os.path.join(CACHE_DIR, "cota.sqlite3")
+        )
+        scheduler.update_limits(
+            float(os.getenv("GEMINI_RPM", 0)) or None,
+            float(os.getenv("GEMINI_TPM", 0)) or None
+        )
+        metrics.register_collector("agendador", scheduler.stats)
+        return scheduler
+    return _shared("scheduler", create)
+
+
+def get_job_queue() -> JobQueue:
+    """Fila de lotes processados pelos workers em segundo plano (worker.py)"""
+    return _shared("job_queue", lambda: JobQueue(os.path.join(CACHE_DIR, "fila.sqlite3")))
+
+
+def get_job_journal() -> JobJournal:
+    """Diário dos lotes processados, usado para retomar lotes interrompidos"""
+    return _shared("job_journal", lambda: JobJournal(os.path.join(CACHE_DIR, "lotes.sqlite3")))
+
+
+def get_catalog() -> ProductCatalog:
+    """Catálogo de produtos, recarregado quando o arquivo é alterado"""
+    catalog = _shared("catalog", lambda: ProductCatalog(CATALOG_PATH))
+    catalog.reload_if_changed()
+    return catalog
+
+
+def get_product_matcher() -> ProductMatcher:
+    """Padrões de produto, cultura e ação do catálogo atual, compilados a cada recarga"""
+    return get_catalog().matcher
+
+
+def cache_model_name(json_mode: bool = False) -> str:
+    """Nome do modelo usado na chave do cache"""
+    backend = get_backend()
+    model_name = f"{backend.model_name if backend else MODEL_NAME}:p{PROMPT_VERSION}"
+    # Respostas em JSON usam outra configuração de geração, então ficam em outra chave do cache
+    return model_name + ":json" if json_mode else model_name
+
+
+def _record_usage(prompt: str, result: GenerationResult) -> str:
+    metrics.increment("chamadas_modelo")
+    metrics.increment("tokens_entrada", result.input_tokens or estimate_tokens(prompt))
+    metrics.increment("tokens_saida", result.output_tokens or estimate_tokens(result.text))
+    return result.text
+
+
+def call_model(prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """Chamada direta ao backend, registrando latência e tokens"""
+    with metrics.timer("modelo"):
+        result = get_backend().generate(prompt, generation_config)
+    return _record_usage(prompt, result)
+
+
+async def acall_model(prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """Versão assíncrona de `call_model`"""
+    with metrics.timer("modelo"):
+        result = await get_backend().agenerate(prompt, generation_config)
+    return _record_usage(prompt, result)
+
+
+def _validator(json_mode: bool) -> Optional[Callable[[str], bool]]:
+    return (lambda text: parse_combined_response(text) is not None) if json_mode else None
+
+
+def generate_text(prompt: str, kind: str, json_mode: bool = False) -> str:
+    """Envia o prompt ao modelo pelo agendador, reaproveitando respostas já geradas para o mesmo prompt"""
+    config = generation_config(kind, json_mode)
+
+    def generate():
+        return get_scheduler().call(lambda: call_model(prompt, config), tokens=estimate_tokens(prompt))
+
+    if not _settings["use_cache"]:
+        return generate()
+    return get_llm_cache().get_or_generate(cache_model_name(json_mode), prompt, generate, validate=_validator(json_mode))
+
+
+async def agenerate_text(prompt: str, kind: str, json_mode: bool = False) -> str:
+    """Versão assíncrona de `generate_text`"""
+    config = generation_config(kind, json_mode)
+
+    async def generate():
+        return await get_scheduler().acall(lambda: acall_model(prompt, config), tokens=estimate_tokens(prompt))
+
+    if not _settings["use_cache"]:
+        return await generate()
+    return await get_llm_cache().aget_or_generate(
+        cache_model_name(json_mode), prompt, generate, validate=_validator(json_mode)
+    )
+
+
+def job_zip_path(job_id: str) -> str:
+    """Caminho do ZIP do lote, sem abri-lo"""
+    return os.path.join(CACHE_DIR, "lotes", f"{job_id}.zip")
+
+
+def job_zip_in_use(job_id: str) -> bool:
+    """Indica se um worker pode estar gravando no ZIP do lote agora
+
+    Enquanto isso, o ZIP só deve ser lido pelo diário (`partial_job_zip`),
+    nunca completado por `open_job_zip`.
+    """
+    return get_job_queue().has_active(job_id)
+
+
+def open_job_zip(job_id: str) -> IncrementalZip:
+    """Abre o ZIP do lote, completando-o com as linhas do diário que ainda não estão nele
+
+    Só os nomes dos arquivos são consultados; o texto é lido apenas para as
+    linhas que faltam no ZIP. Um ZIP corrompido (processo encerrado no meio de
+    uma gravação) é refeito a partir do diário.
+    """
+    job_journal = get_job_journal()
+    try:
+        zip_lote = IncrementalZip(job_zip_path(job_id))
+    except zipfile.BadZipFile:
+        os.remove(job_zip_path(job_id))
+        zip_lote = IncrementalZip(job_zip_path(job_id))
+    for arquivo, linha in job_journal.row_files(job_id).items():
+        if arquivo not in zip_lote:
+            zip_lote.add(arquivo, job_journal.read_briefing(job_id, linha))
+    zip_lote.flush()
+    return zip_lote
+
+
+def job_csv_path(job_id: str) -> str:
+    """CSV enviado para o lote, guardado ao lado do ZIP para que o lote possa ser retomado"""
+    return os.path.join(CACHE_DIR, "lotes", f"{job_id}.csv")
+
+
+def job_inputs(job_id: str) -> Optional[Dict[str, Any]]:
+    """Argumentos de `process_calendar` para retomar um lote do diário
+
+    Devolve None se o lote não existir ou se o CSV não tiver sido guardado
+    (lotes processados antes de os CSVs serem guardados).
+    """
+    lote = get_job_journal().get_job(job_id)
+    if lote is None or not os.path.exists(job_csv_path(job_id)):
+        return None
+    with open(job_csv_path(job_id), "rb") as csv_file:
+        file_bytes = csv_file.read()
+    parametros = lote["parametros"]
+    return {
+        "file_bytes": file_bytes,
+        "nome_arquivo": lote["nome_arquivo"],
+        "coluna_conteudo": parametros["coluna"],
+        "data_input": date.fromisoformat(parametros["data"]),
+        "formato_principal": parametros["formato"],
+        "combined": parametros["combinado"],
+    }
+
+
+def partial_job_zip(job_id: str) -> bytes:
+    """ZIP em memória com os briefings já registrados no diário
+
+    Serve para baixar um lote ainda em processamento em outro processo, sem
+    tocar no arquivo do lote, que o worker continua gravando.
+    """
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for arquivo, briefing in get_job_journal().iter_briefings(job_id):
+            zip_file.writestr(arquivo, briefing)
+    return saida.getvalue()
+
+
+@metrics.traced("selecao_lote")
+def select_batch_rows(file, coluna_conteudo, linhas_concluidas, impressao=None):
+    """Classifica o CSV em blocos e separa as linhas com produto entre pendentes e já concluídas
+
+    Devolve (linhas lidas, linhas pendentes, linhas reaproveitadas do diário).
+    Com `impressao` (ver `row_fingerprinter`), uma linha concluída só é
+    reaproveitada se a impressão digital gravada for igual à atual.
+    """
+    product_matcher = get_product_matcher()
+    linhas_processadas = 0
+    linhas_pendentes = []
+    linhas_reaproveitadas = []
+
+    # Ler apenas a coluna de conteúdo, em blocos classificados de uma vez
+    for bloco in iter_csv_chunks(file, coluna_conteudo):
+        linhas_processadas += len(bloco)
+        classificacao = product_matcher.classify_series(bloco)
+        reconhecidas = classificacao[classificacao["produto"].notna()]
+
+        for index, product, culture, action in reconhecidas.itertuples():
+            # Pular a primeira linha (cabeçalhos)
+            if index == 0:
+                continue
+
+            linha = (index, bloco[index], product, culture, action)
+            concluida = linhas_concluidas.get(index + 1)
+            # Linhas geradas com outro modelo, prompt ou descrição do catálogo são geradas de novo
+            if concluida and (impressao is None or concluida["impressao"] == impressao(linha)):
+                linhas_reaproveitadas.append(concluida)
+            else:
+                linhas_pendentes.append(linha)
+
+    return linhas_processadas, linhas_pendentes, linhas_reaproveitadas
+
+
+def row_fingerprinter(data_input, formato_principal, combined=False) -> Callable[[tuple], str]:
+    """Função que calcula a impressão digital de uma linha, com tudo o que muda o briefing gerado
+
+    Entram o conteúdo, o produto, a cultura e a ação extraídos, a data, o
+    formato, o backend e o modelo com a versão dos prompts (`cache_model_name`)
+    e a descrição do produto no catálogo.
+    """
+    backend = get_backend()
+    model_name = f"{type(backend).__name__}/{cache_model_name(combined)}"
+    catalog = get_catalog()
+
+    def impressao(linha) -> str:
+        index, content, product, culture, action = linha
+        return fingerprint_row(
+            str(content).strip(), product, culture, action, data_input.isoformat(),
+            formato_principal, model_name, catalog.description(product),
+        )
+    return impressao
+
+
+def fingerprint_rows(linhas, data_input, formato_principal, combined=False) -> Dict[int, str]:
+    """Impressão digital de cada linha, pelo índice (ver `row_fingerprinter`)"""
+    impressao = row_fingerprinter(data_input, formato_principal, combined)
+    return {linha[0]: impressao(linha) for linha in linhas}
+
+
+def split_unchanged_rows(linhas_pendentes, data_input, formato_principal, combined=False):
+    """Separa as linhas pendentes cujo briefing já foi gerado, com os mesmos dados, em algum lote
+
+    Devolve (impressões por índice, linhas a gerar, [(linha, (lote, linha) de origem)]).
+    Sem backend configurado os briefings não vêm do modelo, então nenhuma
+    linha é reaproveitada.
+    """
+    impressoes = fingerprint_rows(linhas_pendentes, data_input, formato_principal, combined)
+    origens = get_job_journal().find_fingerprints(impressoes.values()) if get_backend() is not None else {}
+    linhas_a_gerar = []
+    linhas_inalteradas = []
+    for linha in linhas_pendentes:
+        origem = origens.get(impressoes[linha[0]])
+        if origem:
+            linhas_inalteradas.append((linha, origem))
+        else:
+            linhas_a_gerar.append(linha)
+    return impressoes, linhas_a_gerar, linhas_inalteradas
+
+
+def briefing_request_key(linha, data_input, formato_principal):
+    """Chave que identifica linhas do lote que produzem exatamente o mesmo briefing"""
+    index, content, product, culture, action = linha
+    return (product, culture, action, normalize_text(content), data_input.isoformat(), formato_principal)
+
+
+@metrics.traced("extracao")
+def extract_product_info(text: str) -> Tuple[str, str, str]:
+    """Extrai informações do produto do texto da célula"""
+    if not text or not str(text).strip():
+        return None, None, None
+
+    return get_product_matcher().match(str(text).strip())
+
+
+MESES = {
+    1: "janeiro", 2: "fevereiro", 3: "março", 4: "abril",
+    5: "maio", 6: "junho", 7: "julho", 8: "agosto",
+    9: "setembro", 10: "outubro", 11: "novembro", 12: "dezembro"
+}
+
+
+def _prompt_fields(content, product_name, culture, action):
+    return {
+        "produto": product_name,
+        "cultura": culture,
+        "acao": action,
+        "conteudo": content,
+        "descricao": get_catalog().prompt_fragment(product_name),
+    }
+
+
+def build_context_prompt(content, product_name, culture, action, data_input, formato_principal):
+    """Monta o prompt do texto de contexto"""
+    return render("contexto", CONTEXT_TEMPLATE, {
+        **_prompt_fields(content, product_name, culture, action),
+        "mes": MESES[data_input.month],
+        "formato": formato_principal,
+    })
+
+
+def build_strategy_prompt(product_name, culture, action, content, formato_principal=None):
+    """Monta o prompt da estratégia por plataforma
+
+    Com `formato_principal`, a estratégia cobre só as plataformas que o formato usa.
+    """
+    plataformas = platforms_for_format(formato_principal)
+    return render("estrategia", STRATEGY_TEMPLATE, {
+        **_prompt_fields(content, product_name, culture, action),
+        "plataformas": "\n".join(f"- {plataforma}" for plataforma in plataformas),
+    })
+
+
+def build_combined_prompt(content, product_name, culture, action, data_input, formato_principal):
+    """Monta um único prompt que pede contexto e estratégia por plataforma em JSON"""
+    return render("combinado", COMBINED_TEMPLATE, {
+        **_prompt_fields(content, product_name, culture, action),
+        "mes": MESES[data_input.month],
+        "formato": formato_principal,
+        "plataformas": ", ".join(platforms_for_format(formato_principal)),
+    })
+
+
+def parse_combined_response(text: str) -> Optional[Tuple[str, str]]:
+    """Valida a resposta JSON do modo combinado e devolve (contexto, estratégia)"""
+    text = text.strip()
+    # Remover cercas de código markdown que o modelo às vezes inclui
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+
+    if not isinstance(data, dict):
+        return None
+    context = data.get("contexto")
+    platform_strategy = data.get("estrategia")
+    if not isinstance(context, str) or not isinstance(platform_strategy, str):
+        return None
+    if not context.strip() or not platform_strategy.strip():
+        return None
+    return context.strip(), platform_strategy.strip()
+
+
+@metrics.traced("contexto")
+def generate_context(content, product_name, culture, action, data_input, formato_principal):
+    """Gera o texto de contexto discursivo usando LLM"""
+    if get_backend() is None:
+        return "API key do Gemini não configurada. Contexto não disponível."
+
+    prompt = build_context_prompt(content, product_name, culture, action, data_input, formato_principal)
+    return generate_text(prompt, "contexto")
+
+
+@metrics.traced("estrategia")
+def generate_platform_strategy(product_name, culture, action, content, formato_principal=None):
+    """Gera estratégia por plataforma usando Gemini"""
+    if get_backend() is None:
+        return "API key do Gemini não configurada. Estratégias por plataforma não disponíveis."
+
+    prompt = build_strategy_prompt(product_name, culture, action, content, formato_principal)
+    return generate_text(prompt, "estrategia")
+
+
+@metrics.traced("combinado")
+def generate_combined(content, product_name, culture, action, data_input, formato_principal) -> Optional[Tuple[str, str]]:
+    """Gera contexto e estratégia em uma única chamada; devolve None se a resposta for inválida"""
+    if get_backend() is None:
+        return None
+
+    prompt = build_combined_prompt(content, product_name, culture, action, data_input, formato_principal)
+    return parse_combined_response(generate_text(prompt, "combinado", json_mode=True))
+
+
+@metrics.traced("contexto")
+async def agenerate_context(content, product_name, culture, action, data_input, formato_principal):
+    """Versão assíncrona de `generate_context`"""
+    if get_backend() is None:
+        return "API key do Gemini não configurada. Contexto não disponível."
+
+    prompt = build_context_prompt(content, product_name, culture, action, data_input, formato_principal)
+    return await agenerate_text(prompt, "contexto")
+
+
+@metrics.traced("estrategia")
+async def agenerate_platform_strategy(product_name, culture, action, content, formato_principal=None):
+    """Versão assíncrona de `generate_platform_strategy`"""
+    if get_backend() is None:
+        return "API key do Gemini não configurada. Estratégias por plataforma não disponíveis."
+
+    prompt = build_strategy_prompt(product_name, culture, action, content, formato_principal)
+    return await agenerate_text(prompt, "estrategia")
+
+
+@metrics.traced("combinado")
+async def agenerate_combined(content, product_name, culture, action, data_input, formato_principal) -> Optional[Tuple[str, str]]:
+    """Versão assíncrona de `generate_combined`"""
+    if get_backend() is None:
+        return None
+
+    prompt = build_combined_prompt(content, product_name, culture, action, data_input, formato_principal)
+    return parse_combined_response(await agenerate_text(prompt, "combinado", json_mode=True))
+
+
+def format_briefing(product_name, culture, action, context, platform_strategy, data_input, formato_principal, dia_semana=None):
+    """Monta o texto final do briefing a partir das seções geradas"""
+    if dia_semana is None:
+        dia_semana = DIAS_SEMANA[data_input.weekday()]
+    description = get_catalog().description(product_name)
+
+    briefing = f"""
+BRIEFING DE CONTEÚDO - {product_name} - {culture.upper()} - {action.upper()}
+
+CONTEXTO E OBJETIVO
+{context}
+
+DESCRIÇÃO DO PRODUTO
+{description}
+
+ESTRATÉGIA POR PLATAFORMA
+{platform_strategy}
+
+FORMATOS SUGERIDOS
+- Instagram: Reels + Stories + Feed post
+- Facebook: Carrossel + Link post
+- LinkedIn: Artigo + Post informativo
+- WhatsApp: Card informativo + Link
+- YouTube: Shorts + Vídeo explicativo
+- Portal Mais Agro: Blog post + Webstories
+
+CONTATOS E OBSERVAÇÕES
+- Validar com especialista técnico
+- Checar disponibilidade de imagens/vídeos
+- Incluir CTA para portal Mais Agro
+- Seguir guidelines de marca Syngenta
+- Revisar compliance regulatório
+
+DATA PREVISTA: {data_input.strftime('%d/%m/%Y')}
+DIA DA SEMANA: {dia_semana}
+FORMATO PRINCIPAL: {formato_principal}
+"""
+    return briefing
+
+
+@metrics.traced("briefing")
+def generate_briefing(content, product_name, culture, action, data_input, formato_principal, dia_semana=None, combined=False):
+    """Gera um briefing completo em formato de texto puro
+
+    Sem `dia_semana`, o dia é calculado a partir de `data_input`. Com `combined`,
+    tenta gerar contexto e estratégia em uma única chamada e volta para as duas
+    chamadas separadas se a resposta não for um JSON válido.
+    """
+    sections = None
+    if combined:
+        sections = generate_combined(content, product_name, culture, action, data_input, formato_principal)
+
+    if sections:
+        context, platform_strategy = sections
+    else:
+        # As duas chamadas ao modelo são independentes, então rodam em paralelo
+        context, platform_strategy = run_concurrently(
+            lambda: generate_context(content, product_name, culture, action, data_input, formato_principal),
+            lambda: generate_platform_strategy(product_name, culture, action, content, formato_principal),
+        )
+
+    return format_briefing(product_name, culture, action, context, platform_strategy, data_input, formato_principal, dia_semana)
+
+
+@metrics.traced("briefing")
+async def agenerate_briefing(content, product_name, culture, action, data_input, formato_principal, dia_semana=None, combined=False):
+    """Versão assíncrona de `generate_briefing`, para uso com `generate_content_async`"""
+    sections = None
+    if combined:
+        sections = await agenerate_combined(content, product_name, culture, action, data_input, formato_principal)
+
+    if sections:
+        context, platform_strategy = sections
+    else:
+        context, platform_strategy = await asyncio.gather(
+            agenerate_context(content, product_name, culture, action, data_input, formato_principal),
+            agenerate_platform_strategy(product_name, culture, action, content, formato_principal),
+        )
+
+    return format_briefing(product_name, culture, action, context, platform_strategy, data_input, formato_principal, dia_semana)
+
+
+@dataclass
+class BatchReport:
+    """Resumo de um lote processado"""
+    job_id: str
+    linhas_processadas: int
+    linhas_com_produto: int
+    briefings: List[Dict[str, Any]]
+    novos: int
+    reaproveitados: int
+    linhas_duplicadas: int
+    chamadas_economizadas: int
+    falhas: List[Tuple[tuple, Exception]] = field(default_factory=list)
+    zip_path: str = ""
+    cancelado: bool = False
+    alteracoes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_summary(self) -> Dict[str, Any]:
+        """Contadores do lote em formato JSON, sem os briefings (que ficam no diário)"""
+        return {
+            "linhas_processadas": self.linhas_processadas,
+            "linhas_com_produto": self.linhas_com_produto,
+            "novos": self.novos,
+            "reaproveitados": self.reaproveitados,
+            "linhas_duplicadas": self.linhas_duplicadas,
+            "chamadas_economizadas": self.chamadas_economizadas,
+            "falhas": [[list(linha), str(erro)] for linha, erro in self.falhas],
+            "cancelado": self.cancelado,
+            "alteracoes": self.alteracoes,
+        }
+
+    @classmethod
+    def from_summary(cls, job_id: str, resumo: Dict[str, Any]) -> "BatchReport":
+        """Reconstrói o relatório de um lote processado em outro processo, lendo os briefings do diário"""
+        resumo = dict(resumo)
+        falhas = [(tuple(linha), RuntimeError(erro)) for linha, erro in resumo.pop("falhas", [])]
+        return cls(
+            job_id=job_id,
+            briefings=list(get_job_journal().completed_rows(job_id).values()),
+            falhas=falhas,
+            # Outro pedido do mesmo lote pode estar gravando no ZIP; nesse caso ele não é completado aqui
+            zip_path=job_zip_path(job_id) if job_zip_in_use(job_id) else open_job_zip(job_id).path,
+            **resumo,
+        )
+
+
+def calendar_key(nome_arquivo: str, coluna_conteudo: str) -> str:
+    """Identifica as versões de um mesmo calendário, reexportado e enviado de novo
+
+    Usa o nome do arquivo sem a numeração que o navegador acrescenta a
+    downloads repetidos, como "calendario (2).csv", e a coluna de conteúdo.
+    """
+    nome = re.sub(r"\s*\(\d+\)(?=\.\w+$|$)", "", nome_arquivo or "")
+    return f"{normalize_text(nome)}:{coluna_conteudo}"
+
+
+def change_report(situacoes: Dict[int, str], linhas_atuais: Dict[int, Tuple[str, str]],
+                  manifesto_anterior: Dict[int, Dict[str, Any]]) -> str:
+    """CSV com a situação de cada linha em relação ao lote anterior do calendário"""
+    saida = io.StringIO()
+    writer = csv.writer(saida)
+    writer.writerow(["linha", "situacao", "produto", "conteudo"])
+    for linha, situacao in situacoes.items():
+        if situacao == REMOVIDA:
+            produto, conteudo = manifesto_anterior[linha]["produto"], manifesto_anterior[linha]["conteudo"]
+        else:
+            produto, conteudo = linhas_atuais.get(linha, ("", ""))
+        writer.writerow([linha, situacao, produto, conteudo])
+    return saida.getvalue()
+
+
+def batch_job_id(file_bytes: bytes, coluna_conteudo: str, data_input: date, formato_principal: str, combined: bool) -> Tuple[str, Dict[str, Any]]:
+    """Identificador do lote e parâmetros registrados no diário
+
+    O lote é identificado pelo conteúdo do CSV e pelas configurações escolhidas,
+    então reenviar o mesmo arquivo retoma o lote em vez de recomeçar.
+    """
+    parametros = {
+        "coluna": coluna_conteudo,
+        "data": data_input.isoformat(),
+        "formato": formato_principal,
+        "combinado": combined,
+    }
+    return fingerprint_job(file_bytes, **parametros), parametros
+
+
+def build_row_prompts(linha, data_input, formato_principal, combined=False) -> Dict[str, str]:
+    """Prompts que uma linha enviará ao modelo, por tipo"""
+    index, content, product, culture, action = linha
+    if combined:
+        return {"combinado": build_combined_prompt(content, product, culture, action, data_input, formato_principal)}
+    return {
+        "contexto": build_context_prompt(content, product, culture, action, data_input, formato_principal),
+        "estrategia": build_strategy_prompt(product, culture, action, content, formato_principal),
+    }
+
+
+def plan_calendar(
+    file_bytes: bytes,
+    coluna_conteudo: str,
+    data_input: date,
+    formato_principal: str,
+    combined: bool = False,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    call_latency: float = DEFAULT_CALL_LATENCY,
+) -> BatchPlan:
+    """Simula o processamento do calendário sem chamar o modelo"""
+    scheduler = get_scheduler()
+    job_id, _ = batch_job_id(file_bytes, coluna_conteudo, data_input, formato_principal, combined)
+    linhas_concluidas = get_job_journal().completed_rows(job_id)
+    linhas_lidas, linhas_pendentes, linhas_reaproveitadas = select_batch_rows(
+        io.BytesIO(file_bytes), coluna_conteudo, linhas_concluidas,
+        row_fingerprinter(data_input, formato_principal, combined)
+    )
+    _, linhas_pendentes, linhas_inalteradas = split_unchanged_rows(
+        linhas_pendentes, data_input, formato_principal, combined
+    )
+    linhas_reaproveitadas += [linha for linha, _ in linhas_inalteradas]
+    grupos = group_duplicates(
+        linhas_pendentes,
+        key=lambda linha: briefing_request_key(linha, data_input, formato_principal)
+    )
+    model_name = cache_model_name(combined)
+    llm_cache = get_llm_cache()
+
+    # A primeira linha de dados é tratada como cabeçalho e não entra na contagem
+    linhas_de_dados = max(linhas_lidas - 1, 0)
+    return plan_batch(
+        total_linhas=linhas_de_dados,
+        linhas_sem_produto=linhas_de_dados - len(linhas_pendentes) - len(linhas_reaproveitadas),
+        linhas_ja_concluidas=len(linhas_reaproveitadas),
+        linhas_duplicadas=len(linhas_pendentes) - len(grupos),
+        row_prompts=[build_row_prompts(grupo[0], data_input, formato_principal, combined) for grupo in grupos],
+        is_cached=lambda prompt: _settings["use_cache"] and llm_cache.contains(model_name, prompt),
+        concurrency=max_workers,
+        requests_per_minute=requests_per_minute or scheduler.requests_per_minute,
+        tokens_per_minute=tokens_per_minute or scheduler.tokens_per_minute,
+        call_latency=call_latency,
+    )
+
+
+def process_calendar(
+    file_bytes: bytes,
+    nome_arquivo: str,
+    coluna_conteudo: str,
+    data_input: date,
+    formato_principal: str,
+    combined: bool = False,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int, IncrementalZip], None]] = None,
+    use_async: bool = False,
+    cancel_event: Optional[threading.Event] = None,
+) -> BatchReport:
+    """Gera os briefings de todas as linhas com produto reconhecido do CSV
+
+    Linhas já concluídas em uma execução anterior do mesmo lote, ou iguais a
+    uma linha já gerada em outro lote, são reaproveitadas do diário quando a
+    impressão digital (dados, modelo, prompts e catálogo) continua a mesma;
+    linhas idênticas são geradas uma única vez e cada briefing vai para o
+    diário e para o ZIP do lote assim que fica pronto.
+    O ZIP traz ainda alteracoes.csv, que compara as linhas com as do lote
+    anterior do mesmo calendário.
+    `on_progress(concluidos, total, zip_do_lote)` é chamado na thread de quem
+    chamou a função. Com `use_async`, as chamadas usam a API assíncrona do
+    modelo e `max_workers` passa a ser o número de linhas em andamento.
+    Acionar `cancel_event` interrompe o lote; o que já foi gerado fica no diário.
+    O CSV fica guardado com o lote, para que ele possa ser retomado depois
+    (ver `job_inputs`). Sem backend configurado o lote é recusado com
+    RuntimeError, para que os textos de aviso nunca sejam gravados como
+    briefings concluídos.
+    """
+    if get_backend() is None:
+        raise RuntimeError("Nenhum backend de geração configurado: defina GEMINI_API_KEY ou BRIEFING_BACKEND=stub.")
+
+    job_journal = get_job_journal()
+    job_id, parametros = batch_job_id(file_bytes, coluna_conteudo, data_input, formato_principal, combined)
+    linhas_concluidas = job_journal.completed_rows(job_id)
+    linhas_processadas, linhas_pendentes, linhas_reaproveitadas = select_batch_rows(
+        io.BytesIO(file_bytes), coluna_conteudo, linhas_concluidas,
+        row_fingerprinter(data_input, formato_principal, combined)
+    )
+    # Linhas do próprio lote que ficaram desatualizadas saem do ZIP e são geradas de novo
+    arquivos_desatualizados = [
+        linhas_concluidas[index + 1]["arquivo"] for index, *_ in linhas_pendentes if index + 1 in linhas_concluidas
+    ]
+
+    linhas_atuais = {b['linha']: (b['produto'], b['conteudo']) for b in linhas_reaproveitadas}
+    linhas_atuais.update((index + 1, (product, content)) for index, content, product, _, _ in linhas_pendentes)
+    impressoes, linhas_pendentes, linhas_inalteradas = split_unchanged_rows(
+        linhas_pendentes, data_input, formato_principal, combined
+    )
+
+    linhas_com_produto = len(linhas_atuais)
+    job_journal.open_job(
+        job_id, nome_arquivo, parametros, linhas_com_produto, calendar_key(nome_arquivo, coluna_conteudo)
+    )
+    zip_saida = open_job_zip(job_id)
+    if not os.path.exists(job_csv_path(job_id)):
+        with open(job_csv_path(job_id), "wb") as csv_file:
+            csv_file.write(file_bytes)
+    if arquivos_desatualizados:
+        zip_saida.remove(arquivos_desatualizados)
+
+    # Compara as impressões digitais das linhas com as do lote anterior do mesmo calendário
+    manifesto_atual = {linha: dados["impressao"] for linha, dados in job_journal.manifest(job_id).items()}
+    manifesto_atual.update((index + 1, impressao) for index, impressao in impressoes.items())
+    lote_anterior = job_journal.previous_job(job_id)
+    manifesto_anterior = job_journal.manifest(lote_anterior) if lote_anterior else {}
+    situacoes = compare_manifests(
+        manifesto_atual, {linha: dados["impressao"] for linha, dados in manifesto_anterior.items()}
+    )
+
+    # Linhas idênticas são geradas uma única vez e o briefing é copiado para todas
+    grupos_pendentes = group_duplicates(
+        linhas_pendentes,
+        key=lambda linha: briefing_request_key(linha, data_input, formato_principal)
+    )
+
+    def registrar_grupo(grupo, briefing):
+        gerados = []
+        for index, content, product, culture, action in grupo:
+            arquivo = f"briefing_{product}_{index+1}.txt"
+            job_journal.record_row(job_id, index + 1, product, content, arquivo, briefing, impressoes.get(index))
+            with metrics.timer("zip"):
+                zip_saida.add(arquivo, briefing)
+            gerados.append({
+                'linha': index + 1,
+                'produto': product,
+                'conteudo': content,
+                'arquivo': arquivo
+            })
+        return gerados
+
+    # Linhas inalteradas copiam o briefing já gerado, sem chamar o modelo
+    for linha, (lote_origem, linha_origem) in linhas_inalteradas:
+        linhas_reaproveitadas += registrar_grupo([linha], job_journal.read_briefing(lote_origem, linha_origem))
+
+    def gerar_grupo(grupo):
+        index, content, product, culture, action = grupo[0]
+        briefing = generate_briefing(content, product, culture, action, data_input, formato_principal, combined=combined)
+        return registrar_grupo(grupo, briefing)
+
+    async def agerar_grupo(grupo):
+        index, content, product, culture, action = grupo[0]
+        briefing = await agenerate_briefing(content, product, culture, action, data_input, formato_principal, combined=combined)
+        # O diário e o ZIP gravam em disco; fora do laço de eventos, para não travar as outras linhas
+        return await asyncio.to_thread(registrar_grupo, grupo, briefing)
+
+    executar = run_async_batch if use_async else run_batch
+    resultados, falhas_grupos = executar(
+        grupos_pendentes,
+        agerar_grupo if use_async else gerar_grupo,
+        max_workers,
+        on_progress=(lambda concluidos, total: on_progress(concluidos, total, zip_saida)) if on_progress else None,
+        cancel_event=cancel_event
+    )
+    cancelado = cancel_event is not None and cancel_event.is_set()
+    with metrics.timer("zip"):
+        zip_saida.flush()
+        # O relatório é refeito a cada execução, inclusive quando o lote é retomado
+        zip_saida.replace("alteracoes.csv", change_report(situacoes, linhas_atuais, manifesto_anterior))
+
+    falhas = [(linha, erro) for grupo, erro in falhas_grupos for linha in grupo]
+    job_journal.finish_job(job_id, "interrompido" if cancelado else "incompleto" if falhas else "concluido")
+    briefings_novos = [b for gerados in resultados if gerados is not None for b in gerados]
+    linhas_duplicadas = len(linhas_pendentes) - len(grupos_pendentes)
+
+    return BatchReport(
+        job_id=job_id,
+        linhas_processadas=linhas_processadas,
+        linhas_com_produto=linhas_com_produto,
+        briefings=sorted(linhas_reaproveitadas + briefings_novos, key=lambda b: b['linha']),
+        novos=len(briefings_novos),
+        reaproveitados=len(linhas_reaproveitadas),
+        linhas_duplicadas=linhas_duplicadas,
+        chamadas_economizadas=linhas_duplicadas * (1 if combined else 2),
+        falhas=falhas,
+        zip_path=zip_saida.path,
+        cancelado=cancelado,
+        alteracoes={
+            "lote_anterior": lote_anterior,
+            **{situacao: [linha for linha, s in situacoes.items() if s == situacao]
+               for situacao in (NOVA, ALTERADA, INALTERADA, REMOVIDA)},
+        },
+    )
+
+
+def submit_calendar(
+    usuario: str,
+    file_bytes: bytes,
+    nome_arquivo: str,
+    coluna_conteudo: str,
+    data_input: date,
+    formato_principal: str,
+    combined: bool = False,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    use_async: bool = False,
+) -> Tuple[int, str]:
+    """Coloca o calendário na fila dos workers e devolve (id do pedido, id do lote)"""
+    job_id, parametros = batch_job_id(file_bytes, coluna_conteudo, data_input, formato_principal, combined)
+    pedido_id = get_job_queue().submit(
+        usuario, job_id, nome_arquivo,
+        {**parametros, "concorrencia": max_workers, "assincrono": use_async},
+        file_bytes
+    )
+    return pedido_id, job_id
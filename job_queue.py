@@ -0,0 +1,248 @@
+"""Fila de lotes em SQLite, consumida pelos workers em segundo plano (worker.py)."""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Situações de um pedido na fila
+NA_FILA = "na_fila"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+INCOMPLETO = "incompleto"
+FALHOU = "falhou"
+CANCELADO = "cancelado"
+ATIVOS = (NA_FILA, PROCESSANDO)
+
+# Pedidos em processamento sem sinal do worker por mais que isso voltam para a fila
+DEFAULT_STALE_AFTER = 15 * 60
+# Métricas de workers sem atualização por mais que isso não são mais exibidas
+DEFAULT_METRICS_MAX_AGE = 24 * 60 * 60
+
+_COLUNAS = (
+    "id", "usuario", "job_id", "nome_arquivo", "parametros", "status", "concluidas", "total",
+    "erro", "resumo", "worker", "cancelar", "criado_em", "iniciado_em", "atualizado_em",
+)
+
+
+class JobQueue:
+    """Pedidos de processamento em lote, com justiça entre usuários
+
+    O próximo pedido entregue a um worker é o do usuário com menos pedidos em
+    processamento; em caso de empate, o do usuário atendido há mais tempo, e
+    por fim o mais antigo. Assim um calendário grande não trava a fila dos outros.
+    O CSV de cada pedido fica em disco, ao lado do banco.
+    """
+
+    def __init__(self, path: str, stale_after: float = DEFAULT_STALE_AFTER):
+        self.path = path
+        self.stale_after = stale_after
+        self.files_dir = os.path.join(os.path.dirname(path) or ".", "fila")
+        os.makedirs(self.files_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pedidos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                usuario TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                nome_arquivo TEXT,
+                parametros TEXT NOT NULL,
+                status TEXT NOT NULL,
+                concluidas INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                resumo TEXT,
+                worker TEXT,
+                cancelar INTEGER NOT NULL DEFAULT 0,
+                criado_em REAL NOT NULL,
+                iniciado_em REAL,
+                atualizado_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pedidos_status ON pedidos (status, usuario);
+            CREATE TABLE IF NOT EXISTS metricas (
+                worker TEXT PRIMARY KEY,
+                snapshot TEXT NOT NULL,
+                atualizado_em REAL NOT NULL
+            );
+            """
+        )
+
+    def _row(self, row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        pedido = dict(zip(_COLUNAS, row))
+        pedido["parametros"] = json.loads(pedido["parametros"])
+        pedido["resumo"] = json.loads(pedido["resumo"]) if pedido["resumo"] else None
+        pedido["cancelar"] = bool(pedido["cancelar"])
+        return pedido
+
+    def csv_path(self, pedido_id: int) -> str:
+        return os.path.join(self.files_dir, f"{pedido_id}.csv")
+
+    def submit(self, usuario: str, job_id: str, nome_arquivo: str, parametros: Dict[str, Any], file_bytes: bytes) -> int:
+        """Coloca o lote na fila e devolve o id do pedido
+
+        Se o mesmo usuário já tiver o mesmo lote na fila ou em processamento,
+        devolve o pedido existente em vez de processá-lo duas vezes ao mesmo
+        tempo. O mesmo lote enviado por outro usuário vira um pedido próprio,
+        que acompanha no seu painel; as linhas já geradas vêm do diário.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existente = self._conn.execute(
+                    "SELECT id FROM pedidos WHERE job_id = ? AND usuario = ? AND status IN (?, ?)",
+                    (job_id, usuario) + ATIVOS
+                ).fetchone()
+                if existente:
+                    self._conn.execute("COMMIT")
+                    return existente[0]
+
+                now = time.time()
+                pedido_id = self._conn.execute(
+                    "INSERT INTO pedidos (usuario, job_id, nome_arquivo, parametros, status, criado_em, atualizado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (usuario, job_id, nome_arquivo, json.dumps(parametros, default=str), NA_FILA, now, now),
+                ).lastrowid
+                with open(self.csv_path(pedido_id), "wb") as csv_file:
+                    csv_file.write(file_bytes)
+                self._conn.execute("COMMIT")
+                return pedido_id
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Entrega o próximo pedido ao worker, ou None se a fila estiver vazia"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                # Pedidos de workers que pararam de dar sinal voltam para a fila
+                self._conn.execute(
+                    "UPDATE pedidos SET status = ?, worker = NULL WHERE status = ? AND atualizado_em < ?",
+                    (NA_FILA, PROCESSANDO, now - self.stale_after),
+                )
+                # O mesmo lote pedido por outro usuário espera o primeiro terminar,
+                # para não ser gerado em dobro nem gravado no mesmo ZIP ao mesmo tempo
+                row = self._conn.execute(
+                    "SELECT id FROM pedidos p WHERE status = ? "
+                    "AND job_id NOT IN (SELECT job_id FROM pedidos WHERE status = ?) ORDER BY "
+                    "(SELECT COUNT(*) FROM pedidos r WHERE r.usuario = p.usuario AND r.status = ?), "
+                    "COALESCE((SELECT MAX(iniciado_em) FROM pedidos r WHERE r.usuario = p.usuario), 0), "
+                    "id LIMIT 1",
+                    (NA_FILA, PROCESSANDO, PROCESSANDO),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE pedidos SET status = ?, worker = ?, iniciado_em = ?, atualizado_em = ? WHERE id = ?",
+                    (PROCESSANDO, worker, now, now, row[0]),
+                )
+                pedido = self._row(self._conn.execute(
+                    f"SELECT {', '.join(_COLUNAS)} FROM pedidos WHERE id = ?", (row[0],)
+                ).fetchone())
+                self._conn.execute("COMMIT")
+                return pedido
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update_progress(self, pedido_id: int, concluidas: int, total: int) -> bool:
+        """Registra o progresso (e o sinal de vida do worker); devolve se o cancelamento foi pedido"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pedidos SET concluidas = ?, total = ?, atualizado_em = ? WHERE id = ?",
+                (concluidas, total, time.time(), pedido_id),
+            )
+            row = self._conn.execute("SELECT cancelar FROM pedidos WHERE id = ?", (pedido_id,)).fetchone()
+        return bool(row and row[0])
+
+    def touch(self, pedido_id: int) -> None:
+        """Sinal de vida do worker, para o pedido não ser devolvido à fila"""
+        with self._lock:
+            self._conn.execute("UPDATE pedidos SET atualizado_em = ? WHERE id = ?", (time.time(), pedido_id))
+
+    def finish(self, pedido_id: int, status: str, erro: Optional[str] = None,
+               resumo: Optional[Dict[str, Any]] = None) -> None:
+        """Encerra o pedido, guardando o resumo do lote, e apaga o CSV guardado para ele"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pedidos SET status = ?, erro = ?, resumo = ?, atualizado_em = ? WHERE id = ?",
+                (status, erro, json.dumps(resumo) if resumo is not None else None, time.time(), pedido_id),
+            )
+        try:
+            os.remove(self.csv_path(pedido_id))
+        except FileNotFoundError:
+            pass
+
+    def cancel(self, pedido_id: int) -> None:
+        """Cancela o pedido: sai da fila na hora, ou o worker para na próxima linha concluída"""
+        with self._lock:
+            self._conn.execute("UPDATE pedidos SET cancelar = 1 WHERE id = ? AND status = ?", (pedido_id, PROCESSANDO))
+            cancelado = self._conn.execute(
+                "UPDATE pedidos SET status = ?, atualizado_em = ? WHERE id = ? AND status = ?",
+                (CANCELADO, time.time(), pedido_id, NA_FILA),
+            ).rowcount
+        if cancelado:
+            self.finish(pedido_id, CANCELADO)
+
+    def get(self, pedido_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._row(self._conn.execute(
+                f"SELECT {', '.join(_COLUNAS)} FROM pedidos WHERE id = ?", (pedido_id,)
+            ).fetchone())
+
+    def has_active(self, job_id: str) -> bool:
+        """Indica se algum pedido do lote, de qualquer usuário, está na fila ou em processamento"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM pedidos WHERE job_id = ? AND status IN (?, ?) LIMIT 1", (job_id,) + ATIVOS
+            ).fetchone() is not None
+
+    def position(self, pedido_id: int) -> int:
+        """Quantos pedidos estão na fila antes deste (aproximado, pela ordem de chegada)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM pedidos WHERE status = ? AND id < ?", (NA_FILA, pedido_id)
+            ).fetchone()[0]
+
+    def list_jobs(self, usuario: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Pedidos mais recentes, de todos os usuários ou só de `usuario`"""
+        query = f"SELECT {', '.join(_COLUNAS)} FROM pedidos"
+        params: tuple = ()
+        if usuario is not None:
+            query += " WHERE usuario = ?"
+            params = (usuario,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def publish_metrics(self, worker: str, snapshot: Dict[str, Any]) -> None:
+        """Guarda o retrato das métricas de um worker, para o app exibir as dos outros processos"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metricas (worker, snapshot, atualizado_em) VALUES (?, ?, ?)",
+                (worker, json.dumps(snapshot), time.time()),
+            )
+
+    def worker_metrics(self, max_age: float = DEFAULT_METRICS_MAX_AGE) -> Dict[str, Dict[str, Any]]:
+        """Métricas publicadas pelos workers atualizadas nos últimos `max_age` segundos"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT worker, snapshot FROM metricas WHERE atualizado_em >= ? ORDER BY worker",
+                (time.time() - max_age,),
+            ).fetchall()
+        return {worker: json.loads(snapshot) for worker, snapshot in rows}
+
+    def stats(self) -> Dict[str, int]:
+        """Quantidade de pedidos por situação"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM pedidos GROUP BY status").fetchall()
+        return dict(rows)
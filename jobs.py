@@ -0,0 +1,270 @@
+"""Diário (journal) dos lotes de briefings, para retomar processamentos interrompidos."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Situações de cada linha no relatório de alterações em relação ao lote anterior
+NOVA = "nova"
+ALTERADA = "alterada"
+INALTERADA = "inalterada"
+REMOVIDA = "removida"
+
+
+def fingerprint_job(file_bytes: bytes, **params: Any) -> str:
+    """Identificador do lote: hash do CSV enviado e das configurações do processamento"""
+    digest = hashlib.sha256(file_bytes)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def fingerprint_row(*campos: Any) -> str:
+    """Impressão digital de uma linha: hash de tudo o que determina o briefing gerado para ela"""
+    return hashlib.sha256(json.dumps(campos, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def compare_manifests(atual: Dict[int, Optional[str]], anterior: Dict[int, Optional[str]]) -> Dict[int, str]:
+    """Situação de cada linha (número da linha -> impressão digital) em relação ao lote anterior
+
+    Uma linha é inalterada quando a mesma impressão existia no lote anterior,
+    mesmo que em outra posição; alterada quando a posição existia com outra
+    impressão; nova, caso contrário. Linhas do lote anterior cuja posição e
+    impressão sumiram do atual são removidas.
+    """
+    impressoes_anteriores = {impressao for impressao in anterior.values() if impressao}
+    impressoes_atuais = {impressao for impressao in atual.values() if impressao}
+    situacoes = {}
+    for linha, impressao in atual.items():
+        if impressao and impressao in impressoes_anteriores:
+            situacoes[linha] = INALTERADA
+        elif linha in anterior:
+            situacoes[linha] = ALTERADA
+        else:
+            situacoes[linha] = NOVA
+    for linha, impressao in anterior.items():
+        if linha not in atual and impressao not in impressoes_atuais:
+            situacoes[linha] = REMOVIDA
+    return dict(sorted(situacoes.items()))
+
+
+class JobJournal:
+    """Registro em SQLite dos lotes e de cada linha já concluída"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS lotes (
+                job_id TEXT PRIMARY KEY,
+                nome_arquivo TEXT,
+                parametros TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL,
+                status TEXT NOT NULL,
+                calendario TEXT
+            );
+            CREATE TABLE IF NOT EXISTS linhas (
+                job_id TEXT NOT NULL,
+                linha INTEGER NOT NULL,
+                produto TEXT NOT NULL,
+                conteudo TEXT NOT NULL,
+                arquivo TEXT NOT NULL,
+                briefing TEXT NOT NULL,
+                concluido_em REAL NOT NULL,
+                impressao TEXT,
+                PRIMARY KEY (job_id, linha)
+            );
+            """
+        )
+        # Diários criados antes das impressões digitais ganham as colunas novas
+        for tabela, coluna in (("lotes", "calendario"), ("linhas", "impressao")):
+            colunas = {row[1] for row in self._conn.execute(f"PRAGMA table_info({tabela})")}
+            if coluna not in colunas:
+                self._conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} TEXT")
+        self._conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS lotes_calendario ON lotes (calendario, criado_em);
+            CREATE INDEX IF NOT EXISTS linhas_impressao ON linhas (impressao);
+            """
+        )
+        self._conn.commit()
+
+    def open_job(self, job_id: str, nome_arquivo: str, parametros: Dict[str, Any], total: int,
+                 calendario: Optional[str] = None) -> None:
+        """Cria o lote se ainda não existir, ou o marca como em andamento de novo
+
+        `calendario` identifica as versões de um mesmo calendário enviadas em
+        momentos diferentes, para comparar cada lote com o anterior.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO lotes (job_id, nome_arquivo, parametros, total, criado_em, atualizado_em, status, calendario) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'em_andamento', ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET total = excluded.total, "
+                "atualizado_em = excluded.atualizado_em, status = 'em_andamento', "
+                "calendario = COALESCE(excluded.calendario, calendario)",
+                (job_id, nome_arquivo, json.dumps(parametros, default=str), total, now, now, calendario),
+            )
+            self._conn.commit()
+
+    def finish_job(self, job_id: str, status: str = "concluido") -> None:
+        """Marca o fim do lote ('concluido' ou 'incompleto' quando houve falhas)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE lotes SET status = ?, atualizado_em = ? WHERE job_id = ?",
+                (status, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def record_row(self, job_id: str, linha: int, produto: str, conteudo: str, arquivo: str, briefing: str,
+                   impressao: Optional[str] = None) -> None:
+        """Registra uma linha concluída
+
+        Uma linha já registrada só é sobrescrita quando foi gerada de novo por
+        ter ficado desatualizada (outro modelo, prompt ou descrição do catálogo).
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO linhas (job_id, linha, produto, conteudo, arquivo, briefing, concluido_em, impressao) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id, linha) DO UPDATE SET produto = excluded.produto, conteudo = excluded.conteudo, "
+                "arquivo = excluded.arquivo, briefing = excluded.briefing, concluido_em = excluded.concluido_em, "
+                "impressao = excluded.impressao",
+                (job_id, linha, produto, conteudo, arquivo, briefing, time.time(), impressao),
+            )
+            self._conn.commit()
+
+    def completed_rows(self, job_id: str) -> Dict[int, Dict[str, Any]]:
+        """Linhas já concluídas do lote (sem o texto do briefing), indexadas pelo número da linha"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT linha, produto, conteudo, arquivo, impressao FROM linhas WHERE job_id = ? ORDER BY linha",
+                (job_id,),
+            ).fetchall()
+        return {
+            linha: {"linha": linha, "produto": produto, "conteudo": conteudo, "arquivo": arquivo, "impressao": impressao}
+            for linha, produto, conteudo, arquivo, impressao in rows
+        }
+
+    def manifest(self, job_id: str) -> Dict[int, Dict[str, Any]]:
+        """Impressão digital, produto e conteúdo de cada linha concluída do lote"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT linha, impressao, produto, conteudo FROM linhas WHERE job_id = ? ORDER BY linha",
+                (job_id,),
+            ).fetchall()
+        return {
+            linha: {"impressao": impressao, "produto": produto, "conteudo": conteudo}
+            for linha, impressao, produto, conteudo in rows
+        }
+
+    def previous_job(self, job_id: str) -> Optional[str]:
+        """Lote anterior do mesmo calendário, criado antes deste"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT anterior.job_id FROM lotes atual JOIN lotes anterior "
+                "ON anterior.calendario = atual.calendario AND anterior.job_id != atual.job_id "
+                "AND anterior.criado_em <= atual.criado_em "
+                "WHERE atual.job_id = ? ORDER BY anterior.criado_em DESC LIMIT 1",
+                (job_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_fingerprints(self, impressoes: Iterable[str]) -> Dict[str, Tuple[str, int]]:
+        """Linha já concluída (lote, linha) para cada impressão digital encontrada em qualquer lote"""
+        impressoes = list(set(impressoes))
+        encontradas: Dict[str, Tuple[str, int]] = {}
+        # Consulta em blocos para não passar do limite de parâmetros do SQLite
+        for inicio in range(0, len(impressoes), 500):
+            bloco = impressoes[inicio:inicio + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT impressao, job_id, linha FROM linhas WHERE impressao IN ({', '.join('?' * len(bloco))}) "
+                    "ORDER BY concluido_em",
+                    bloco,
+                ).fetchall()
+            # A ordenação faz a linha concluída mais recentemente prevalecer
+            encontradas.update((impressao, (job_id, linha)) for impressao, job_id, linha in rows)
+        return encontradas
+
+    def read_briefing(self, job_id: str, linha: int) -> Optional[str]:
+        """Texto de um briefing já gerado"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT briefing FROM linhas WHERE job_id = ? AND linha = ?", (job_id, linha)
+            ).fetchone()
+        return row[0] if row else None
+
+    def row_files(self, job_id: str) -> Dict[str, int]:
+        """Nome do arquivo de cada linha concluída do lote, sem ler o texto dos briefings"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT arquivo, linha FROM linhas WHERE job_id = ? ORDER BY linha", (job_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def iter_briefings(self, job_id: str) -> Iterator[Tuple[str, str]]:
+        """Percorre (arquivo, briefing) do lote, um de cada vez"""
+        with self._lock:
+            linhas = [row[0] for row in self._conn.execute(
+                "SELECT linha FROM linhas WHERE job_id = ? ORDER BY linha", (job_id,)
+            )]
+        for linha in linhas:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT arquivo, briefing FROM linhas WHERE job_id = ? AND linha = ?", (job_id, linha)
+                ).fetchone()
+            if row:
+                yield row[0], row[1]
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Lotes mais recentes com a quantidade de linhas concluídas
+
+        `ultima_atividade` é o momento da última linha concluída (ou da última
+        mudança de situação), para reconhecer lotes que pararam no meio.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT l.job_id, l.nome_arquivo, l.parametros, l.total, l.criado_em, l.atualizado_em, l.status, "
+                "COUNT(linhas.linha), MAX(l.atualizado_em, COALESCE(MAX(linhas.concluido_em), 0)) "
+                "FROM lotes l LEFT JOIN linhas ON linhas.job_id = l.job_id "
+                "GROUP BY l.job_id ORDER BY l.atualizado_em DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {
+                "job_id": job_id,
+                "nome_arquivo": nome_arquivo,
+                "parametros": json.loads(parametros),
+                "total": total,
+                "criado_em": criado_em,
+                "atualizado_em": atualizado_em,
+                "status": status,
+                "concluidas": concluidas,
+                "ultima_atividade": ultima_atividade,
+            }
+            for job_id, nome_arquivo, parametros, total, criado_em, atualizado_em, status, concluidas, ultima_atividade
+            in rows
+        ]
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Nome do arquivo, parâmetros e situação de um lote"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT nome_arquivo, parametros, status FROM lotes WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"job_id": job_id, "nome_arquivo": row[0], "parametros": json.loads(row[1]), "status": row[2]}
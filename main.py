@@ -1,11 +1,43 @@
 import streamlit as st
 import pandas as pd
-import google.generativeai as genai
+import atexit
+import hashlib
+import io
 import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, List, Tuple
-import re
-import io
+
+from core import (
+    DIAS_SEMANA,
+    FORMATOS,
+    BatchReport,
+    agenerate_briefing,
+    batch_job_id,
+    configure_backend,
+    extract_product_info,
+    generate_briefing,
+    get_catalog,
+    get_job_journal,
+    get_job_queue,
+    get_llm_cache,
+    get_scheduler,
+    job_inputs,
+    job_zip_in_use,
+    open_job_zip,
+    partial_job_zip,
+    plan_calendar,
+    process_calendar,
+    submit_calendar,
+)
+from batch import DEFAULT_MAX_WORKERS, run_coroutine
+from job_queue import ATIVOS, NA_FILA
+from metrics import metrics
+from planner import DEFAULT_CALL_LATENCY
+from streaming import read_csv_preview
 
 # Configuração inicial
 st.set_page_config(
@@ -14,202 +46,228 @@ st.set_page_config(
     page_icon="📋"
 )
 
-# Dicionário de descrições de produtos (baseado nos briefings anteriores)
-PRODUCT_DESCRIPTIONS = {
-    "FORTENZA": "Tratamento de sementes inseticida, focado no Cerrado e posicionado para controle do complexo de lagartas e outras pragas iniciais. Comunicação focada no mercado 'on farm' (tratamento feito na fazenda).",
-    "ALADE": "Fungicida para controle de doenças em soja, frequentemente posicionado em programa com Mitrion para controle de podridões de vagens e grãos.",
-    "VERDAVIS": "Inseticida e acaricida composto por PLINAZOLIN® technology (nova molécula, novo grupo químico, modo de ação inédito) + lambda-cialotrina. KBFs: + mais choque, + mais espectro e + mais dias de controle.",
-    "ENGEO PLENO S": "Inseticida de tradição, referência no controle de percevejos. Mote: 'Nunca foi sorte. Sempre foi Engeo Pleno S'.",
-    "MEGAFOL": "Bioativador da Syngenta Biologicals. Origem 100% natural (extratos vegetais e de algas Ascophyllum nodosum). Desenvolvido para garantir que a planta alcance todo seu potencial produtivo.",
-    "MIRAVIS DUO": "Fungicida da família Miravis. Traz ADEPIDYN technology (novo ingrediente ativo, novo grupo químico). Focado no controle de manchas foliares.",
-    "AVICTA COMPLETO": "Oferta comercial de tratamento industrial de sementes (TSI). Composto por inseticida, fungicida e nematicida.",
-    "MITRION": "Fungicida para controle de doenças em soja, frequentemente posicionado em programa com Alade.",
-    "AXIAL": "Herbicida para trigo. Composto por um novo ingrediente ativo. Foco no controle do azevém.",
-    "CERTANO": "Bionematicida e biofungicida. Composto pela bactéria Bacillus velezensis. Controla nematoides e fungos de solo.",
-    "MANEJO LIMPO": "Programa da Syngenta para manejo integrado de plantas daninhas.",
-    "ELESTAL NEO": "Fungicida para controle de doenças em soja e algodão.",
-    "FRONDEO": "Inseticida para cana-de-açúcar com foco no controle da broca da cana.",
-    "FORTENZA ELITE": "Oferta comercial de TSI. Solução robusta contre pragas, doenças e nematoides do Cerrado.",
-    "REVERB": "Produto para manejo de doenças em soja e milho com ação prolongada ou de espectro amplo.",
-    "YIELDON": "Produto focado em maximizar a produtividade das lavouras.",
-    "ORONDIS FLEXI": "Fungicida com flexibilidade de uso para controle de requeima, míldios e manchas.",
-    "RIZOLIQ LLI": "Inoculante ou produto para tratamento de sementes que atua na rizosfera.",
-    "ARVATICO": "Fungicida ou inseticida com ação específica para controle de doenças foliares ou pragas.",
-    "VERDADERO": "Produto relacionado à saúde do solo ou nutrição vegetal.",
-    "MIRAVIS": "Fungicida da família Miravis para controle de doenças.",
-    "MIRAVIS PRO": "Fungicida premium da família Miravis para controle avançado de doenças.",
-    "INSTIVO": "Lagarticida posicionado como especialista no controle de lagartas do gênero Spodoptera.",
-    "CYPRESS": "Fungicida posicionado para últimas aplicações na soja, consolidando o manejo de doenças.",
-    "CALARIS": "Herbicida composto por atrazina + mesotriona para controle de plantas daninhas no milho.",
-    "SPONTA": "Inseticida para algodão com PLINAZOLIN® technology para controle de bicudo e outras pragas.",
-    "INFLUX": "Inseticida lagarticida premium para controle de todas as lagartas, especialmente helicoverpa.",
-    "JOINER": "Inseticida acaricida com tecnologia PLINAZOLIN para culturas hortifrúti.",
-    "DUAL GOLD": "Herbicida para manejo de plantas daninhas.",
-}
-
 # Inicializar Gemini
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 if not gemini_api_key:
     gemini_api_key = st.secrets.get("GEMINI_API_KEY", "")
 
-if gemini_api_key:
-    genai.configure(api_key=gemini_api_key)
-    modelo_texto = genai.GenerativeModel("gemini-1.5-flash")
-else:
-    st.warning("API key do Gemini não encontrada. Algumas funcionalidades estarão limitadas.")
+@st.cache_resource(show_spinner=False)
+def carregar_backend(api_key):
+    """Backend de geração compartilhado entre sessões e reruns; só é recriado se a chave mudar"""
+    return configure_backend(api_key)
 
-# Título do aplicativo
-st.title("Gerador de Briefings - SYN")
-st.markdown("Digite o conteúdo da célula do calendário para gerar um briefing completo no padrão SYN.")
 
-# Funções principais
-def extract_product_info(text: str) -> Tuple[str, str, str]:
-    """Extrai informações do produto do texto da célula"""
-    if not text or not text.strip():
-        return None, None, None
-    
-    text = str(text).strip()
-    
-    # Remover emojis e marcadores
-    clean_text = re.sub(r'[🔵🟠🟢🔴🟣🔃📲]', '', text).strip()
-    
-    # Padrões para extração
-    patterns = {
-        'product': r'\b([A-Z][A-Za-z\s]+(?:PRO|S|NEO|LLI|ELITE|COMPLETO|DUO|FLEXI|PLENO|XTRA)?)\b',
-        'culture': r'\b(soja|milho|algodão|cana|trigo|HF|café|citrus|batata|melão|uva|tomate|multi)\b',
-        'action': r'\b(depoimento|resultados|série|reforço|controle|lançamento|importância|jornada|conceito|vídeo|ação|diferenciais|awareness|problemática|glossário|manejo|aplicação|posicionamento)\b'
-    }
-    
-    product_match = re.search(patterns['product'], clean_text, re.IGNORECASE)
-    culture_match = re.search(patterns['culture'], clean_text, re.IGNORECASE)
-    action_match = re.search(patterns['action'], clean_text, re.IGNORECASE)
-    
-    product = product_match.group(1).strip().upper() if product_match else None
-    culture = culture_match.group(0).lower() if culture_match else "multi"
-    action = action_match.group(0).lower() if action_match else "conscientização"
-    
-    return product, culture, action
+@st.cache_resource(show_spinner=False)
+def pool_workers():
+    """Grupo de workers da fila deste servidor, encerrado junto com o processo do Streamlit"""
+    pool = {"processo": None, "config": None, "lock": threading.Lock()}
 
-def generate_context(content, product_name, culture, action, data_input, formato_principal):
-    """Gera o texto de contexto discursivo usando LLM"""
-    if not gemini_api_key:
-        return "API key do Gemini não configurada. Contexto não disponível."
-    
-    # Determinar mês em português
-    meses = {
-        1: "janeiro", 2: "fevereiro", 3: "março", 4: "abril",
-        5: "maio", 6: "junho", 7: "julho", 8: "agosto",
-        9: "setembro", 10: "outubro", 11: "novembro", 12: "dezembro"
-    }
-    mes = meses[data_input.month]
-    
-    prompt = f"""
-    Como redator especializado em agronegócio da Syngenta, elabore um texto contextual discursivo de 3-4 parágrafos para uma pauta de conteúdo.
-
-    Informações da pauta:
-    - Produto: {product_name}
-    - Cultura: {culture}
-    - Ação/tema: {action}
-    - Mês de publicação: {mes}
-    - Formato principal: {formato_principal}
-    - Conteúdo original: {content}
-
-    Descrição do produto: {PRODUCT_DESCRIPTIONS.get(product_name, 'Produto agrícola Syngenta')}
-
-    Instruções:
-    - Escreva em formato discursivo e fluido, com 3-4 parágrafos bem estruturados
-    - Mantenha tom técnico mas acessível, adequado para produtores rurais
-    - Contextualize a importância do tema para a cultura e época do ano
-    - Explique por que este conteúdo é relevante neste momento
-    - Inclua considerações sobre o público-alvo e objetivos da comunicação
-    - Não repita literalmente a descrição do produto, mas a incorpore naturalmente no texto
-    - Use linguagem persuasiva mas factual, baseada em dados técnicos
-
-    Formato: Texto corrido em português brasileiro
+    def encerrar():
+        if pool["processo"] is not None and pool["processo"].poll() is None:
+            pool["processo"].terminate()
+            pool["processo"].wait(timeout=30)
+
+    pool["encerrar"] = encerrar
+    atexit.register(encerrar)
+    return pool
+
+
+def iniciar_workers(processos, api_key):
+    """Mantém os workers da fila rodando, uma única vez por servidor; eles continuam se a aba for fechada
+
+    Se a configuração (quantidade ou chave da API) mudar, ou se os workers
+    terminarem, o grupo anterior é encerrado e outro é iniciado.
     """
+    pool = pool_workers()
+    with pool["lock"]:
+        if pool["processo"] is not None and pool["processo"].poll() is None and pool["config"] == (processos, api_key):
+            return pool["processo"]
+        pool["encerrar"]()
+        env = dict(os.environ, BRIEFING_WORKERS=str(processos))
+        if api_key:
+            env["GEMINI_API_KEY"] = api_key
+        worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+        pool["processo"] = subprocess.Popen([sys.executable, worker, "--processos", str(processos)], env=env)
+        pool["config"] = (processos, api_key)
+        return pool["processo"]
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def zip_parcial(job_id, concluidas):
+    """ZIP parcial de um lote da fila, montado de novo só quando o progresso muda"""
+    return partial_job_zip(job_id)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def carregar_previa(hash_arquivo, _conteudo):
+    """Prévia do CSV, lida uma única vez por arquivo (identificado pelo hash do conteúdo)"""
+    return read_csv_preview(io.BytesIO(_conteudo))
+
+
+backend = carregar_backend(gemini_api_key)
+if backend is None:
+    st.warning("API key do Gemini não encontrada. Algumas funcionalidades estarão limitadas.")
+
+llm_cache = get_llm_cache()
+scheduler = get_scheduler()
+job_journal = get_job_journal()
+job_queue = get_job_queue()
+
+# Workers locais que processam os lotes em segundo plano, com justiça entre
+# usuários; com BRIEFING_WORKERS=0 o lote roda na própria sessão do Streamlit
+WORKERS_LOCAIS = int(os.getenv("BRIEFING_WORKERS", "2"))
+# Cada réplica do servidor inicia o próprio grupo; para dividir um grupo só entre
+# réplicas, use BRIEFING_WORKERS=0 no app e rode `python worker.py` à parte
+if WORKERS_LOCAIS and backend is not None:
+    iniciar_workers(WORKERS_LOCAIS, gemini_api_key)
+
+SITUACOES_FILA = {
+    "na_fila": "⏳ na fila",
+    "processando": "⚙️ processando",
+    "concluido": "✅ concluído",
+    "incompleto": "⚠️ concluído com falhas",
+    "falhou": "❌ falhou",
+    "cancelado": "⏹ cancelado",
+}
+
+# Situações do diário em que nenhum processo grava mais no ZIP do lote
+LOTES_ENCERRADOS = ("concluido", "incompleto", "interrompido")
+# Lotes em andamento sem nenhuma linha concluída nesse tempo (em segundos) são
+# considerados parados, por exemplo quando o servidor reiniciou no meio do lote
+LOTE_PARADO_APOS = 10 * 60
+
+# Intervalo mínimo, em segundos, entre as cópias do ZIP parcial oferecidas durante um lote
+INTERVALO_ZIP_PARCIAL = 60
+
+# Opções de paginação da lista de briefings do lote
+TAMANHOS_PAGINA = [10, 25, 50, 100]
+
+# A API assíncrona do Gemini mantém mais chamadas em andamento com menos threads
+ASYNC_PADRAO = os.getenv("BRIEFING_ASYNC", "").lower() in ("1", "true", "sim")
+
+def painel_fila(usuario, acompanhando):
+    """Lotes do usuário na fila; atualizado a cada 2s enquanto houver lote em andamento"""
+    pedidos = job_queue.list_jobs(usuario=usuario, limit=10)
+    if not pedidos:
+        return
     
-    try:
-        response = modelo_texto.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Erro ao gerar contexto: {str(e)}"
-
-def generate_platform_strategy(product_name, culture, action, content):
-    """Gera estratégia por plataforma usando Gemini"""
-    if not gemini_api_key:
-        return "API key do Gemini não configurada. Estratégias por plataforma não disponíveis."
+    st.markdown("### Meus Lotes na Fila")
+    for pedido in pedidos:
+        col1, col2, col3 = st.columns([3, 2, 1])
+        with col1:
+            st.text(f"#{pedido['id']} - {pedido['nome_arquivo']} - {SITUACOES_FILA.get(pedido['status'], pedido['status'])}")
+            if pedido['status'] == NA_FILA:
+                st.caption(f"{job_queue.position(pedido['id'])} lotes à frente na fila")
+            elif pedido['erro']:
+                st.caption(pedido['erro'])
+        with col2:
+            if pedido['total']:
+                st.progress(min(pedido['concluidas'] / pedido['total'], 1.0), text=f"{pedido['concluidas']}/{pedido['total']} briefings")
+        with col3:
+            chave_zip = f"queue_zip_open_{pedido['id']}"
+            if pedido['status'] in ATIVOS:
+                st.button("Cancelar", key=f"queue_cancel_{pedido['id']}", on_click=job_queue.cancel, args=(pedido['id'],))
+                # Durante o processamento, os briefings já prontos podem ser baixados
+                if pedido['concluidas'] and not st.session_state.get(chave_zip):
+                    st.button("ZIP parcial", key=f"queue_open_{pedido['id']}", on_click=st.session_state.__setitem__, args=(chave_zip, True))
+                elif pedido['concluidas']:
+                    st.download_button(
+                        label=f"📥 {pedido['concluidas']}",
+                        data=zip_parcial(pedido['job_id'], pedido['concluidas']),
+                        file_name=f"briefings_syngenta_{pedido['job_id']}_parcial.zip",
+                        mime="application/zip",
+                        on_click="ignore",
+                        key=f"queue_partial_zip_{pedido['id']}"
+                    )
+            elif pedido['concluidas'] and not st.session_state.get(chave_zip):
+                st.button("Abrir", key=f"queue_open_{pedido['id']}", on_click=st.session_state.__setitem__, args=(chave_zip, True))
+            elif pedido['concluidas']:
+                st.download_button(
+                    label="📥 ZIP",
+                    data=zip_do_lote(pedido['job_id'], pedido['concluidas']),
+                    file_name=f"briefings_syngenta_{pedido['job_id']}.zip",
+                    mime="application/zip",
+                    on_click="ignore",
+                    key=f"queue_zip_{pedido['id']}"
+                )
     
-    prompt = f"""
-    Como especialista em mídias sociais para o agronegócio Syngenta, crie uma estratégia de conteúdo detalhada:
-
-    PRODUTO: {product_name}
-    CULTURA: {culture}
-    AÇÃO: {action}
-    CONTEÚDO ORIGINAL: {content}
-    DESCRIÇÃO DO PRODUTO: {PRODUCT_DESCRIPTIONS.get(product_name, 'Produto agrícola Syngenta')}
-
-    FORNECER ESTRATÉGIA PARA:
-    - Instagram (Feed, Reels, Stories)
-    - Facebook 
-    - LinkedIn
-    - WhatsApp Business
-    - YouTube
-    - Portal Mais Agro (blog)
-
-    INCLUIR PARA CADA PLATAFORMA:
-    1. Tipo de conteúdo recomendado
-    2. Formato ideal (vídeo, carrossel, estático, etc.)
-    3. Tom de voz apropriado
-    4. CTA específico
-    5. Melhores práticas
-
-    Formato: Texto claro com seções bem definidas
+    # Quando o lote enviado por esta sessão termina, os resultados são carregados do diário
+    pedido_sessao = next((p for p in pedidos if p['id'] == st.session_state.get("pedido_lote")), None)
+    if pedido_sessao and pedido_sessao['status'] not in ATIVOS:
+        st.session_state["pedido_lote"] = None
+        if pedido_sessao['resumo']:
+            st.session_state["resultado_lote"] = BatchReport.from_summary(pedido_sessao['job_id'], pedido_sessao['resumo'])
+        st.rerun()
+    # Sem lotes em andamento, a atualização periódica é desligada
+    if acompanhando and not any(p['status'] in ATIVOS for p in pedidos):
+        st.rerun()
+
+
+def identificar_usuario(nome=""):
+    """Identidade do usuário na fila, usada para alternar os lotes entre usuários
+
+    Usa o e-mail do login do Streamlit quando há autenticação configurada, ou
+    o nome digitado; sem nenhum deles, um identificador da sessão, guardado na
+    URL para sobreviver a recarregamentos da página.
     """
-    
-    try:
-        response = modelo_texto.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Erro ao gerar estratégia: {str(e)}"
-
-def generate_briefing(content, product_name, culture, action, data_input, formato_principal):
-    """Gera um briefing completo em formato de texto puro"""
-    description = PRODUCT_DESCRIPTIONS.get(product_name, "Descrição do produto não disponível.")
-    context = generate_context(content, product_name, culture, action, data_input, formato_principal)
-    platform_strategy = generate_platform_strategy(product_name, culture, action, content)
-    
-    briefing = f"""
-BRIEFING DE CONTEÚDO - {product_name} - {culture.upper()} - {action.upper()}
-
-CONTEXTO E OBJETIVO
-{context}
-
-DESCRIÇÃO DO PRODUTO
-{description}
-
-ESTRATÉGIA POR PLATAFORMA
-{platform_strategy}
-
-FORMATOS SUGERIDOS
-- Instagram: Reels + Stories + Feed post
-- Facebook: Carrossel + Link post
-- LinkedIn: Artigo + Post informativo
-- WhatsApp: Card informativo + Link
-- YouTube: Shorts + Vídeo explicativo
-- Portal Mais Agro: Blog post + Webstories
-
-CONTATOS E OBSERVAÇÕES
-- Validar com especialista técnico
-- Checar disponibilidade de imagens/vídeos
-- Incluir CTA para portal Mais Agro
-- Seguir guidelines de marca Syngenta
-- Revisar compliance regulatório
-
-DATA PREVISTA: {data_input.strftime('%d/%m/%Y')}
-DIA DA SEMANA: {dia_semana}
-FORMATO PRINCIPAL: {formato_principal}
-"""
-    return briefing
+    usuario_logado = getattr(st, "user", None)
+    if usuario_logado is not None and usuario_logado.get("is_logged_in") and usuario_logado.get("email"):
+        return usuario_logado.get("email")
+    if nome:
+        return nome
+    if "id_sessao" not in st.session_state:
+        st.session_state["id_sessao"] = st.query_params.get("sessao") or uuid.uuid4().hex[:12]
+    st.query_params["sessao"] = st.session_state["id_sessao"]
+    return f"sessao-{st.session_state['id_sessao']}"
+
+
+def zip_do_lote(job_id, concluidas):
+    """ZIP do lote para download; montado em memória se um worker ainda pode estar gravando no arquivo"""
+    if job_zip_in_use(job_id):
+        return zip_parcial(job_id, concluidas)
+    return open_job_zip(job_id).read_bytes()
+
+
+def pode_retomar(lote):
+    """Indica se o lote do diário terminou ou parou com linhas ainda por gerar"""
+    if lote['status'] in ("incompleto", "interrompido"):
+        return True
+    return lote['status'] == "em_andamento" and time.time() - lote['ultima_atividade'] > LOTE_PARADO_APOS
+
+
+def retomar_lote(job_id, usuario):
+    """Gera só as linhas que faltam de um lote do diário, a partir do CSV guardado com ele"""
+    entradas = job_inputs(job_id)
+    if entradas is None:
+        st.error(f"O CSV do lote {job_id} não foi guardado; envie o arquivo de novo com as mesmas configurações para continuar.")
+    elif backend is None:
+        st.error("Configure a API key do Gemini (ou BRIEFING_BACKEND=stub) para retomar lotes.")
+    elif job_zip_in_use(job_id):
+        st.info(f"O lote {job_id} já está na fila; acompanhe o progresso em Meus Lotes na Fila.")
+    elif WORKERS_LOCAIS:
+        pedido_id, _ = submit_calendar(usuario, **entradas, use_async=ASYNC_PADRAO)
+        st.session_state["pedido_lote"] = pedido_id
+        st.success(f"Lote {job_id} enviado para a fila (pedido #{pedido_id}); só as linhas que faltam serão geradas.")
+    else:
+        with st.spinner(f"Retomando o lote {job_id}..."):
+            relatorio = process_calendar(**entradas, use_async=ASYNC_PADRAO)
+        st.success(
+            f"Lote {job_id} retomado: {relatorio.novos} briefings gerados agora, "
+            f"{relatorio.reaproveitados} reaproveitados."
+        )
+        st.download_button(
+            label="📥 Baixar ZIP",
+            data=zip_do_lote(job_id, len(relatorio.briefings)),
+            file_name=f"briefings_syngenta_{job_id}.zip",
+            mime="application/zip",
+            on_click="ignore",
+            key=f"download_resumed_job_{job_id}"
+        )
+
+
+# Título do aplicativo
+st.title("Gerador de Briefings - SYN")
+st.markdown("Digite o conteúdo da célula do calendário para gerar um briefing completo no padrão SYN.")
 
 # Interface principal
 st.markdown("### Opções de Geração")
@@ -237,56 +295,75 @@ with tab1:
     with col2:
         dia_semana = st.selectbox(
             "Dia da semana:",
-            ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"],
+            DIAS_SEMANA,
             key="individual_day"
         )
 
     with col3:
         formato_principal = st.selectbox(
             "Formato principal:",
-            ["Reels + capa", "Carrossel + stories", "Blog + redes", "Vídeo + stories", "Multiplataforma"],
+            FORMATOS,
             key="individual_format"
         )
 
+    modo_combinado = st.checkbox(
+        "Gerar contexto e estratégia em uma única chamada",
+        value=False,
+        help="Usa metade das requisições e dos tokens de entrada. Se a resposta vier fora do formato esperado, as duas chamadas separadas são usadas.",
+        key="individual_combined"
+    )
+
+    modo_assincrono = st.checkbox(
+        "Backend assíncrono",
+        value=ASYNC_PADRAO,
+        help="Usa a API assíncrona do modelo em vez de uma thread por chamada.",
+        key="individual_async"
+    )
+
     generate_btn = st.button("Gerar Briefing Individual", type="primary", key="individual_btn")
 
-    # Processamento e exibição do briefing individual
+    # Processamento do briefing individual; o resultado fica na sessão para
+    # sobreviver às próximas interações sem chamar o modelo de novo
     if generate_btn and content_input:
         with st.spinner("Analisando conteúdo e gerando briefing..."):
             # Extrair informações do produto
             product, culture, action = extract_product_info(content_input)
             
-            if product and product in PRODUCT_DESCRIPTIONS:
+            if product and product in get_catalog():
                 # Gerar briefing completo
-                briefing = generate_briefing(content_input, product, culture, action, data_input, formato_principal)
+                try:
+                    if modo_assincrono:
+                        briefing = run_coroutine(agenerate_briefing(
+                            content_input, product, culture, action, data_input, formato_principal,
+                            dia_semana=dia_semana,
+                            combined=modo_combinado
+                        ))
+                    else:
+                        briefing = generate_briefing(
+                            content_input, product, culture, action, data_input, formato_principal,
+                            dia_semana=dia_semana,
+                            combined=modo_combinado
+                        )
+                except Exception as e:
+                    st.error(f"Erro ao gerar briefing: {str(e)}")
+                    briefing = None
                 
-                # Exibir briefing
-                st.markdown("## Briefing Gerado")
-                st.text(briefing)
-                
-                # Botão de download
-                st.download_button(
-                    label="Baixar Briefing",
-                    data=briefing,
-                    file_name=f"briefing_{product}_{data_input.strftime('%Y%m%d')}.txt",
-                    mime="text/plain",
-                    key="individual_download"
-                )
-                
-                # Informações extras
-                with st.expander("Informações Extraídas"):
-                    st.write(f"Produto: {product}")
-                    st.write(f"Cultura: {culture}")
-                    st.write(f"Ação: {action}")
-                    st.write(f"Data: {data_input.strftime('%d/%m/%Y')}")
-                    st.write(f"Dia da semana: {dia_semana}")
-                    st.write(f"Formato principal: {formato_principal}")
-                    st.write(f"Descrição: {PRODUCT_DESCRIPTIONS[product]}")
+                st.session_state["briefing_individual"] = {
+                    "briefing": briefing,
+                    "produto": product,
+                    "cultura": culture,
+                    "acao": action,
+                    "data": data_input,
+                    "dia_semana": dia_semana,
+                    "formato": formato_principal,
+                } if briefing else None
                     
             elif product:
-                st.warning(f"Produto '{product}' não encontrado no dicionário. Verifique a grafia.")
-                st.info("Produtos disponíveis: " + ", ".join(list(PRODUCT_DESCRIPTIONS.keys())[:10]) + "...")
+                st.session_state["briefing_individual"] = None
+                st.warning(f"Produto '{product}' não encontrado no catálogo. Verifique a grafia.")
+                st.info("Produtos disponíveis: " + ", ".join(list(get_catalog())[:10]) + "...")
             else:
+                st.session_state["briefing_individual"] = None
                 st.error("Não foi possível identificar um produto no conteúdo. Tente formatos como:")
                 st.code("""
                 megafol - série - potencial máximo, todo o tempo
@@ -294,6 +371,32 @@ with tab1:
                 engeo pleno s - milho - controle percevejo
                 miravis duo - algodão - reforço preventivo
                 """)
+    
+    # Exibição do último briefing individual gerado
+    resultado_individual = st.session_state.get("briefing_individual")
+    if resultado_individual:
+        st.markdown("## Briefing Gerado")
+        st.text(resultado_individual["briefing"])
+        
+        # Botão de download; não reinicia o script, então nada é recalculado
+        st.download_button(
+            label="Baixar Briefing",
+            data=resultado_individual["briefing"],
+            file_name=f"briefing_{resultado_individual['produto']}_{resultado_individual['data'].strftime('%Y%m%d')}.txt",
+            mime="text/plain",
+            on_click="ignore",
+            key="individual_download"
+        )
+        
+        # Informações extras
+        with st.expander("Informações Extraídas"):
+            st.write(f"Produto: {resultado_individual['produto']}")
+            st.write(f"Cultura: {resultado_individual['cultura']}")
+            st.write(f"Ação: {resultado_individual['acao']}")
+            st.write(f"Data: {resultado_individual['data'].strftime('%d/%m/%Y')}")
+            st.write(f"Dia da semana: {resultado_individual['dia_semana']}")
+            st.write(f"Formato principal: {resultado_individual['formato']}")
+            st.write(f"Descrição: {get_catalog().description(resultado_individual['produto'])}")
 
 with tab2:
     st.markdown("### Processamento em Lote via CSV")
@@ -304,6 +407,14 @@ with tab2:
     e gerar briefings apenas para as linhas que contêm produtos reconhecidos.
     """)
     
+    nome_usuario = st.text_input(
+        "Seu nome ou e-mail (opcional):",
+        help="Identifica seus lotes na fila em outros navegadores; sem ele, os lotes ficam ligados a esta sessão. "
+             "Os workers alternam entre usuários para que ninguém espere pelo lote grande de outra pessoa.",
+        key="usuario"
+    ).strip()
+    usuario = identificar_usuario(nome_usuario)
+    
     uploaded_file = st.file_uploader(
         "Escolha o arquivo CSV", 
         type=['csv'],
@@ -312,13 +423,14 @@ with tab2:
     
     if uploaded_file is not None:
         try:
-            # Ler o CSV
-            df = pd.read_csv(uploaded_file)
-            st.success(f"CSV carregado com sucesso! {len(df)} linhas encontradas.")
+            # Ler só o início do CSV; o arquivo completo é percorrido em blocos no processamento
+            conteudo_arquivo = uploaded_file.getvalue()
+            df_previa = carregar_previa(hashlib.sha256(conteudo_arquivo).hexdigest(), conteudo_arquivo)
+            st.success(f"CSV carregado com sucesso! {len(df_previa.columns)} colunas encontradas.")
             
             # Mostrar prévia do arquivo
             with st.expander("Visualizar primeiras linhas do CSV"):
-                st.dataframe(df.head())
+                st.dataframe(df_previa)
             
             # Configurações para processamento em lote
             st.markdown("### Configurações do Processamento em Lote")
@@ -334,126 +446,387 @@ with tab2:
             with col2:
                 formato_padrao = st.selectbox(
                     "Formato principal padrão:",
-                    ["Reels + capa", "Carrossel + stories", "Blog + redes", "Vídeo + stories", "Multiplataforma"],
+                    FORMATOS,
                     key="batch_format"
                 )
             
             # Identificar coluna com conteúdo
-            colunas = df.columns.tolist()
+            colunas = df_previa.columns.tolist()
             coluna_conteudo = st.selectbox(
                 "Selecione a coluna que contém o conteúdo das células:",
                 colunas,
                 help="Selecione a coluna que contém os textos das células do calendário"
             )
             
-            processar_lote = st.button("Processar CSV e Gerar Briefings", type="primary", key="batch_btn")
+            max_workers = st.slider(
+                "Linhas processadas simultaneamente:",
+                min_value=1,
+                max_value=16,
+                value=DEFAULT_MAX_WORKERS,
+                help="Cada linha faz duas chamadas ao modelo em paralelo. Reduza se atingir o limite de cota da API.",
+                key="batch_workers"
+            )
+            
+            modo_combinado_lote = st.checkbox(
+                "Gerar contexto e estratégia em uma única chamada",
+                value=False,
+                help="Usa metade das requisições e dos tokens de entrada. Se a resposta vier fora do formato esperado, as duas chamadas separadas são usadas.",
+                key="batch_combined"
+            )
+            
+            modo_assincrono_lote = st.checkbox(
+                "Backend assíncrono",
+                value=ASYNC_PADRAO,
+                help="Usa a API assíncrona do modelo: as linhas simultâneas deixam de ocupar uma thread cada.",
+                key="batch_async"
+            )
+            
+            with st.expander("Limites de cota da API"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    limite_rpm = st.number_input(
+                        "Requisições por minuto:",
+                        min_value=1,
+                        value=int(scheduler.requests_per_minute),
+                        key="batch_rpm"
+                    )
+                with col2:
+                    limite_tpm = st.number_input(
+                        "Tokens por minuto:",
+                        min_value=1000,
+                        value=int(scheduler.tokens_per_minute),
+                        step=1000,
+                        key="batch_tpm"
+                    )
+                st.caption("Erros de cota (429) são repetidos com espera exponencial; linhas que falharem voltam para a fila.")
+            
+            # Reenviar o mesmo CSV com as mesmas configurações retoma o lote em vez de recomeçar
+            job_id, _ = batch_job_id(
+                conteudo_arquivo, coluna_conteudo, data_padrao, formato_padrao, modo_combinado_lote
+            )
+            linhas_concluidas = job_journal.completed_rows(job_id)
+            if linhas_concluidas:
+                st.info(
+                    f"Lote {job_id} já iniciado anteriormente: {len(linhas_concluidas)} briefings concluídos "
+                    "serão reaproveitados e apenas as linhas restantes serão geradas."
+                )
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                simular_lote = st.button("Simular Lote (sem chamar o modelo)", key="batch_dry_run_btn")
+            with col2:
+                processar_lote = st.button("Processar CSV e Gerar Briefings", type="primary", key="batch_btn")
             
-            if processar_lote:
-                briefings_gerados = []
-                linhas_processadas = 0
-                linhas_com_produto = 0
+            if st.session_state.get("batch_stop_btn"):
+                st.warning(
+                    f"Lote {job_id} interrompido. Os briefings já gerados foram salvos; "
+                    "envie o mesmo CSV com as mesmas configurações para continuar de onde parou."
+                )
+            
+            if simular_lote:
+                with st.spinner("Analisando o CSV..."):
+                    plano = plan_calendar(
+                        conteudo_arquivo,
+                        coluna_conteudo,
+                        data_padrao,
+                        formato_padrao,
+                        combined=modo_combinado_lote,
+                        max_workers=max_workers,
+                        requests_per_minute=limite_rpm,
+                        tokens_per_minute=limite_tpm,
+                        call_latency=DEFAULT_CALL_LATENCY
+                    )
+                
+                st.markdown("### Simulação do Lote")
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Linhas com produto", plano.linhas_com_produto)
+                col2.metric("Linhas sem produto", plano.linhas_sem_produto)
+                col3.metric("Já concluídas", plano.linhas_ja_concluidas)
+                col4.metric("Duplicadas", plano.linhas_duplicadas, help=f"{plano.chamadas_economizadas} chamadas economizadas")
+                
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Chamadas ao modelo", plano.chamadas_ao_modelo)
+                col2.metric("Respostas em cache", plano.chamadas_em_cache)
+                col3.metric("Tokens de entrada", f"{plano.tokens_entrada_total:,}".replace(",", "."))
+                col4.metric("Tempo estimado", f"{plano.tempo_estimado_s / 60:.1f} min")
+                
+                if plano.tokens_por_prompt:
+                    st.caption("Tokens de entrada médios por prompt: " + ", ".join(
+                        f"{tipo}: {tokens}" for tipo, tokens in plano.tokens_por_prompt.items()
+                    ))
+                if plano.gargalo:
+                    st.caption(
+                        f"Limite dominante: {plano.gargalo} (estimativa com {max_workers} linhas simultâneas, "
+                        f"{limite_rpm} requisições e {limite_tpm} tokens por minuto, "
+                        f"{DEFAULT_CALL_LATENCY:.0f}s por chamada)."
+                    )
+            
+            if processar_lote and backend is None:
+                # Sem backend os workers não são iniciados e o pedido ficaria na fila para sempre;
+                # na própria sessão, os textos de aviso seriam gravados como briefings concluídos
+                st.error(
+                    "Configure a API key do Gemini (ou BRIEFING_BACKEND=stub) para processar lotes: "
+                    "sem um backend de geração nenhum briefing pode ser gerado."
+                )
+            elif processar_lote and WORKERS_LOCAIS:
+                # A cota é compartilhada por todos os workers e sessões
+                scheduler.update_limits(limite_rpm, limite_tpm)
+                pedido_id, _ = submit_calendar(
+                    usuario,
+                    conteudo_arquivo,
+                    uploaded_file.name,
+                    coluna_conteudo,
+                    data_padrao,
+                    formato_padrao,
+                    combined=modo_combinado_lote,
+                    max_workers=max_workers,
+                    use_async=modo_assincrono_lote
+                )
+                st.session_state["pedido_lote"] = pedido_id
+                st.success(
+                    f"Lote enviado para a fila (pedido #{pedido_id}). Você pode fechar a aba: "
+                    "o processamento continua e o ZIP fica disponível em Meus Lotes na Fila."
+                )
+            elif processar_lote:
+                scheduler.update_limits(limite_rpm, limite_tpm)
                 
                 progress_bar = st.progress(0)
                 status_text = st.empty()
+                download_parcial = st.empty()
+                # Clicar em Parar reinicia o script, o que interrompe o lote em andamento
+                st.button("⏹ Parar", key="batch_stop_btn")
+                estado_download = {"gravados": 0, "em": time.monotonic()}
                 
-                for index, row in df.iterrows():
-                    linhas_processadas += 1
-                    progress_bar.progress(linhas_processadas / len(df))
-                    status_text.text(f"Processando linha {linhas_processadas} de {len(df)}...")
-                    
-                    # Pular a primeira linha (cabeçalhos)
-                    if index == 0:
-                        continue
-                    
-                    # Obter conteúdo da célula
-                    content = str(row[coluna_conteudo]) if pd.notna(row[coluna_conteudo]) else ""
+                def atualizar_progresso(concluidas, total, zip_saida):
+                    progress_bar.progress(concluidas / total)
+                    status_text.text(f"Briefing único {concluidas} de {total} gerado...")
                     
-                    if content:
-                        # Extrair informações do produto
-                        product, culture, action = extract_product_info(content)
-                        
-                        if product and product in PRODUCT_DESCRIPTIONS:
-                            linhas_com_produto += 1
-                            # Gerar briefing
-                            briefing = generate_briefing(
-                                content, 
-                                product, 
-                                culture, 
-                                action, 
-                                data_padrao, 
-                                formato_padrao
-                            )
-                            
-                            briefings_gerados.append({
-                                'linha': index + 1,
-                                'produto': product,
-                                'conteudo': content,
-                                'briefing': briefing,
-                                'arquivo': f"briefing_{product}_{index+1}.txt"
-                            })
+                    # Oferecer o ZIP parcial com os briefings novos a cada INTERVALO_ZIP_PARCIAL segundos:
+                    # o Streamlit guarda cada cópia do ZIP até o fim da execução, então oferecer
+                    # uma a cada grupo gravado faria a memória crescer com o quadrado do lote
+                    agora = time.monotonic()
+                    novos = zip_saida.written != estado_download["gravados"]
+                    if novos and agora - estado_download["em"] >= INTERVALO_ZIP_PARCIAL:
+                        estado_download["gravados"] = zip_saida.written
+                        estado_download["em"] = agora
+                        download_parcial.download_button(
+                            label=f"📥 Baixar ZIP parcial ({zip_saida.written} briefings)",
+                            data=zip_saida.read_bytes(),
+                            file_name="briefings_syngenta_parcial.zip",
+                            mime="application/zip",
+                            on_click="ignore",
+                            key=f"batch_partial_zip_{zip_saida.written}"
+                        )
+                
+                relatorio = process_calendar(
+                    conteudo_arquivo,
+                    uploaded_file.name,
+                    coluna_conteudo,
+                    data_padrao,
+                    formato_padrao,
+                    combined=modo_combinado_lote,
+                    max_workers=max_workers,
+                    on_progress=atualizar_progresso,
+                    use_async=modo_assincrono_lote
+                )
                 
                 progress_bar.empty()
                 status_text.empty()
+                download_parcial.empty()
+                
+                # O relatório fica na sessão: qualquer outra interação reinicia o script,
+                # mas os resultados são reexibidos sem processar o lote de novo
+                st.session_state["resultado_lote"] = relatorio
+            
+            relatorio = st.session_state.get("resultado_lote")
+            if relatorio is not None and relatorio.job_id == job_id:
+                briefings_gerados = relatorio.briefings
+                falhas = relatorio.falhas
+                # Com outro pedido do mesmo lote na fila, um worker grava no ZIP: os briefings
+                # são lidos do diário e o download é montado em memória, sem tocar no arquivo
+                if job_zip_in_use(relatorio.job_id):
+                    zip_saida = None
+                else:
+                    # O ZIP é aberto uma vez por resultado; paginação, busca e pré-visualização
+                    # reaproveitam o mesmo objeto nos reruns, sem consultar o diário de novo
+                    zip_sessao = st.session_state.get("zip_lote")
+                    if zip_sessao is None or zip_sessao[0] is not relatorio:
+                        zip_sessao = (relatorio, open_job_zip(relatorio.job_id))
+                        st.session_state["zip_lote"] = zip_sessao
+                    zip_saida = zip_sessao[1]
                 
                 # Resultados do processamento
-                st.success(f"Processamento concluído! {linhas_com_produto} briefings gerados de {linhas_processadas-1} linhas processadas.")
+                st.success(f"Processamento concluído! {len(briefings_gerados)} briefings gerados de {relatorio.linhas_processadas-1} linhas processadas.")
+                if relatorio.reaproveitados:
+                    st.caption(
+                        f"{relatorio.reaproveitados} briefings reaproveitados de execuções anteriores; "
+                        f"{relatorio.novos} gerados agora."
+                    )
+                alteracoes = relatorio.alteracoes
+                if alteracoes.get("lote_anterior"):
+                    st.info(
+                        f"Em relação à versão anterior do calendário (lote {alteracoes['lote_anterior']}): "
+                        f"{len(alteracoes['nova'])} linhas novas, {len(alteracoes['alterada'])} alteradas, "
+                        f"{len(alteracoes['inalterada'])} inalteradas e {len(alteracoes['removida'])} removidas. "
+                        "Só as novas e alteradas foram geradas de novo; o relatório completo está em alteracoes.csv, no ZIP."
+                    )
+                    with st.expander("Linhas alteradas desde a versão anterior"):
+                        for situacao in ("nova", "alterada", "removida"):
+                            if alteracoes[situacao]:
+                                st.write(f"{situacao.capitalize()}s: linhas " + ", ".join(map(str, alteracoes[situacao])))
+                if relatorio.linhas_duplicadas:
+                    st.caption(
+                        f"{relatorio.linhas_duplicadas} linhas repetiam o pedido de outra linha e reaproveitaram o mesmo briefing "
+                        f"({relatorio.chamadas_economizadas} chamadas ao modelo economizadas)."
+                    )
                 
-                if briefings_gerados:
-                    # Exibir resumo
-                    st.markdown("### Briefings Gerados")
-                    resumo_df = pd.DataFrame([{
-                        'Linha': b['linha'],
-                        'Produto': b['produto'],
-                        'Conteúdo': b['conteudo'][:50] + '...' if len(b['conteudo']) > 50 else b['conteudo']
-                    } for b in briefings_gerados])
-                    
-                    st.dataframe(resumo_df)
-                    
-                    # Criar arquivo ZIP com todos os briefings
-                    import zipfile
-                    from io import BytesIO
-                    
-                    zip_buffer = BytesIO()
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                        for briefing_info in briefings_gerados:
-                            zip_file.writestr(
-                                briefing_info['arquivo'], 
-                                briefing_info['briefing']
-                            )
-                    
-                    zip_buffer.seek(0)
-                    
-                    # Botão para download do ZIP
-                    st.download_button(
-                        label="📥 Baixar Todos os Briefings (ZIP)",
-                        data=zip_buffer,
-                        file_name="briefings_syngenta.zip",
-                        mime="application/zip",
-                        key="batch_download_zip"
+                if falhas:
+                    st.error(
+                        f"{len(falhas)} de {relatorio.linhas_com_produto} linhas com produto falharam mesmo após novas tentativas "
+                        "e não foram incluídas: linhas " + ", ".join(str(linha[0] + 1) for linha, _ in falhas)
                     )
-                    
-                    # Também permitir download individual
-                    st.markdown("---")
-                    st.markdown("### Download Individual")
-                    
-                    for briefing_info in briefings_gerados:
+                    with st.expander("Detalhes das falhas"):
+                        for linha, erro in falhas:
+                            st.write(f"Linha {linha[0] + 1}: {erro}")
+                
+                stats_cache = llm_cache.stats()
+                st.caption(
+                    f"Cache de respostas: {stats_cache['hits_memoria'] + stats_cache['hits_disco']} acertos, "
+                    f"{stats_cache['misses']} chamadas ao modelo desde o início do servidor."
+                )
+                stats_agendador = scheduler.stats()
+                st.caption(
+                    f"Cota da API: {stats_agendador['novas_tentativas']} novas tentativas após erro 429, "
+                    f"{stats_agendador['segundos_em_espera']}s aguardando o limite de requisições."
+                )
+                
+                # Renderização dos resultados também é medida; com a paginação, o custo
+                # fica constante e só o briefing selecionado é lido e enviado ao navegador
+                with metrics.timer("renderizacao_resultados"):
+                    if briefings_gerados:
+                        st.markdown("### Briefings Gerados")
+                        
+                        # Botão para download do ZIP já gravado em disco
+                        st.download_button(
+                            label="📥 Baixar Todos os Briefings (ZIP)",
+                            data=(
+                                zip_saida.read_bytes() if zip_saida is not None
+                                else zip_parcial(relatorio.job_id, len(briefings_gerados))
+                            ),
+                            file_name="briefings_syngenta.zip",
+                            mime="application/zip",
+                            on_click="ignore",
+                            key="batch_download_zip"
+                        )
+                        
                         col1, col2 = st.columns([3, 1])
                         with col1:
-                            st.text(f"Linha {briefing_info['linha']}: {briefing_info['produto']} - {briefing_info['conteudo'][:30]}...")
+                            busca = st.text_input(
+                                "Buscar por produto, conteúdo ou linha:",
+                                key="batch_results_search"
+                            ).strip()
                         with col2:
+                            tamanho_pagina = st.selectbox(
+                                "Por página:", TAMANHOS_PAGINA, key="batch_results_page_size"
+                            )
+                        
+                        resumo_df = pd.DataFrame(briefings_gerados, columns=['linha', 'produto', 'conteudo', 'arquivo'])
+                        if busca:
+                            resumo_df = resumo_df[
+                                resumo_df['produto'].str.contains(busca, case=False, regex=False)
+                                | resumo_df['conteudo'].str.contains(busca, case=False, regex=False)
+                                | (resumo_df['linha'].astype(str) == busca)
+                            ]
+                        
+                        total_paginas = max(1, -(-len(resumo_df) // tamanho_pagina))
+                        # A chave muda com a busca e o tamanho da página, voltando para a primeira página
+                        pagina = st.number_input(
+                            f"Página (de {total_paginas}):",
+                            min_value=1,
+                            max_value=total_paginas,
+                            value=1,
+                            key=f"batch_results_page_{busca}_{tamanho_pagina}"
+                        )
+                        pagina_df = resumo_df.iloc[(pagina - 1) * tamanho_pagina:pagina * tamanho_pagina]
+                        st.caption(f"{len(resumo_df)} de {len(briefings_gerados)} briefings.")
+                        
+                        if pagina_df.empty:
+                            st.info("Nenhum briefing corresponde à busca.")
+                        else:
+                            st.dataframe(
+                                pagina_df[['linha', 'produto', 'conteudo']].rename(
+                                    columns={'linha': 'Linha', 'produto': 'Produto', 'conteudo': 'Conteúdo'}
+                                ),
+                                hide_index=True
+                            )
+                            
+                            # Pré-visualização e download individual de um briefing por vez
+                            registros_pagina = pagina_df.set_index('linha').to_dict('index')
+                            linha_selecionada = st.selectbox(
+                                "Pré-visualizar briefing:",
+                                list(registros_pagina),
+                                format_func=lambda linha: (
+                                    f"Linha {linha}: {registros_pagina[linha]['produto']} - "
+                                    f"{registros_pagina[linha]['conteudo'][:50]}"
+                                ),
+                                key=f"batch_results_selected_{busca}_{tamanho_pagina}_{pagina}"
+                            )
+                            selecionado = registros_pagina[linha_selecionada]
+                            if zip_saida is not None:
+                                texto_briefing = zip_saida.read(selecionado['arquivo'])
+                            else:
+                                texto_briefing = job_journal.read_briefing(relatorio.job_id, linha_selecionada)
+                            st.text(texto_briefing)
                             st.download_button(
                                 label="📄 Baixar",
-                                data=briefing_info['briefing'],
-                                file_name=briefing_info['arquivo'],
+                                data=texto_briefing,
+                                file_name=selecionado['arquivo'],
                                 mime="text/plain",
-                                key=f"download_{briefing_info['linha']}"
+                                on_click="ignore",
+                                key="batch_download_selected"
                             )
-                else:
-                    st.warning("Nenhum briefing foi gerado. Verifique se o CSV contém produtos reconhecidos.")
-                    st.info("Produtos reconhecidos: " + ", ".join(list(PRODUCT_DESCRIPTIONS.keys())[:15]) + "...")
+                    else:
+                        st.warning("Nenhum briefing foi gerado. Verifique se o CSV contém produtos reconhecidos.")
+                        st.info("Produtos reconhecidos: " + ", ".join(list(get_catalog())[:15]) + "...")
                     
         except Exception as e:
             st.error(f"Erro ao processar o arquivo CSV: {str(e)}")
+    
+    if WORKERS_LOCAIS:
+        em_andamento = any(p['status'] in ATIVOS for p in job_queue.list_jobs(usuario=usuario, limit=10))
+        st.fragment(run_every=2 if em_andamento else None)(painel_fila)(usuario, em_andamento)
+    
+    # Lotes anteriores podem ser reabertos para baixar o que já foi gerado,
+    # ou retomados para gerar só as linhas que ainda faltam
+    lotes_recentes = job_journal.list_jobs(limit=10)
+    if lotes_recentes:
+        with st.expander("Lotes Recentes"):
+            for lote in lotes_recentes:
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    st.text(
+                        f"{lote['job_id']} - {lote['nome_arquivo']} - "
+                        f"{lote['concluidas']}/{lote['total']} briefings - {lote['status']} - "
+                        f"{datetime.fromtimestamp(lote['atualizado_em']).strftime('%d/%m/%Y %H:%M')}"
+                    )
+                with col2:
+                    if lote['concluidas'] and st.button("Abrir", key=f"open_job_{lote['job_id']}"):
+                        # Um lote em andamento ainda é gravado por um worker ou por outra sessão,
+                        # então o ZIP é montado em memória sem tocar no arquivo do lote
+                        if lote['status'] in LOTES_ENCERRADOS:
+                            dados_zip = zip_do_lote(lote['job_id'], lote['concluidas'])
+                        else:
+                            dados_zip = partial_job_zip(lote['job_id'])
+                        st.download_button(
+                            label="📥 Baixar ZIP",
+                            data=dados_zip,
+                            file_name=f"briefings_syngenta_{lote['job_id']}.zip",
+                            mime="application/zip",
+                            on_click="ignore",
+                            key=f"download_job_{lote['job_id']}"
+                        )
+                    if pode_retomar(lote) and st.button("Retomar", key=f"resume_job_{lote['job_id']}"):
+                        retomar_lote(lote['job_id'], usuario)
 
 # Seção de exemplos
 with st.expander("Exemplos de Conteúdo", expanded=True):
@@ -478,7 +851,7 @@ with st.expander("Exemplos de Conteúdo", expanded=True):
 # Lista de produtos reconhecidos
 with st.expander("Produtos Reconhecidos"):
     col1, col2, col3 = st.columns(3)
-    products = list(PRODUCT_DESCRIPTIONS.keys())
+    products = list(get_catalog())
     
     with col1:
         for product in products[:10]:
@@ -492,6 +865,73 @@ with st.expander("Produtos Reconhecidos"):
         for product in products[20:]:
             st.write(f"• {product}")
 
+# Estado do cache de respostas do modelo
+with st.expander("Cache de Respostas"):
+    stats_cache = llm_cache.stats()
+    metricas_workers = job_queue.worker_metrics()
+    # Os acertos são contados em cada processo; os dos workers vêm das métricas publicadas na fila
+    for campo in ("hits_memoria", "hits_disco", "misses"):
+        stats_cache[campo] += sum(
+            snapshot_worker["contadores"].get(f"cache_{campo}", 0) for snapshot_worker in metricas_workers.values()
+        )
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Acertos (memória)", stats_cache["hits_memoria"])
+    col2.metric("Acertos (disco)", stats_cache["hits_disco"])
+    col3.metric("Chamadas ao modelo", stats_cache["misses"])
+    st.caption(f"{stats_cache['entradas']} respostas armazenadas ({stats_cache['bytes'] / 1024:.1f} KB).")
+    if st.button("Limpar cache", key="clear_cache_btn"):
+        llm_cache.clear()
+        st.success("Cache limpo.")
+
+# Painel de métricas de desempenho
+with st.expander("Métricas de Desempenho"):
+    # Cada processo mede as próprias etapas; os lotes da fila são medidos nos workers
+    snapshots = {"app": metrics.snapshot(), **job_queue.worker_metrics()}
+    if any(snapshot["etapas"] for snapshot in snapshots.values()):
+        st.dataframe(pd.DataFrame([{
+            'Processo': processo,
+            'Etapa': etapa,
+            'Execuções': resumo['count'],
+            'p50 (ms)': round(resumo['p50'] * 1000, 1),
+            'p95 (ms)': round(resumo['p95'] * 1000, 1),
+            'p99 (ms)': round(resumo['p99'] * 1000, 1),
+            'Máximo (ms)': round(resumo['max'] * 1000, 1),
+            'Total (s)': round(resumo['sum'], 2)
+        } for processo, snapshot in snapshots.items() for etapa, resumo in sorted(snapshot["etapas"].items())]))
+    else:
+        st.caption("Nenhuma etapa medida ainda.")
+    
+    st.dataframe(pd.DataFrame([
+        {'Processo': processo, 'Contador': nome, 'Valor': valor}
+        for processo, snapshot in snapshots.items() for nome, valor in sorted(snapshot["contadores"].items())
+    ]))
+    st.caption("As exportações abaixo cobrem só o processo do app; as linhas dos workers vêm da fila.")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            label="Exportar JSON",
+            data=metrics.to_json(),
+            file_name="metricas_briefings.json",
+            mime="application/json",
+            on_click="ignore",
+            key="metrics_json"
+        )
+    with col2:
+        st.download_button(
+            label="Exportar Prometheus",
+            data=metrics.to_prometheus(),
+            file_name="metricas_briefings.prom",
+            mime="text/plain",
+            on_click="ignore",
+            key="metrics_prometheus"
+        )
+    with col3:
+        # Os workers mantêm as próprias métricas e as publicam de novo, então só as do app são zeradas
+        if st.button("Zerar métricas do app", key="metrics_reset", help="As métricas dos workers não são afetadas."):
+            metrics.reset()
+            st.success("Métricas do app zeradas.")
+
 # Rodapé
 st.markdown("---")
 st.caption("Ferramenta de geração automática de briefings - Padrão SYN. Digite o conteúdo da célula do calendário para gerar briefings completos.")
@@ -0,0 +1,130 @@
+"""Identificação de produto, cultura e ação no texto das células do calendário."""
+import re
+import unicodedata
+from typing import Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+import pandas as pd
+
+CULTURES = [
+    "soja", "milho", "algodão", "cana", "trigo", "HF", "café", "citrus",
+    "batata", "melão", "uva", "tomate", "multi",
+]
+
+ACTIONS = [
+    "depoimento", "resultados", "série", "reforço", "controle", "lançamento",
+    "importância", "jornada", "conceito", "vídeo", "ação", "diferenciais",
+    "awareness", "problemática", "glossário", "manejo", "aplicação", "posicionamento",
+]
+
+DEFAULT_CULTURE = "multi"
+DEFAULT_ACTION = "conscientização"
+
+# Palpite genérico de nome de produto, usado só para avisar sobre produtos fora da lista
+GENERIC_PRODUCT_PATTERN = re.compile(
+    r'\b([A-Z][A-Za-z\s]+(?:PRO|S|NEO|LLI|ELITE|COMPLETO|DUO|FLEXI|PLENO|XTRA)?)\b',
+    re.IGNORECASE,
+)
+EMOJI_PATTERN = re.compile(r'[🔵🟠🟢🔴🟣🔃📲]')
+
+
+def normalize_text(text: str) -> str:
+    """Remove acentos e pontuação, converte para minúsculas e junta espaços repetidos"""
+    folded = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", folded.lower()).strip()
+
+
+def normalize_series(series: pd.Series) -> pd.Series:
+    """Versão vetorizada de `normalize_text` para uma coluna inteira"""
+    return (
+        series.fillna("").astype(str)
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+        .str.lower()
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def _compile_vocabulary(terms: Iterable[str], aliases: Optional[Mapping[str, str]] = None) -> Tuple[re.Pattern, Dict[str, str]]:
+    """Compila uma alternância que prefere o termo mais longo, sobre os termos normalizados
+
+    `aliases` mapeia grafias alternativas para o termo oficial.
+    """
+    canonical = {normalize_text(term): term for term in terms}
+    for alias, term in (aliases or {}).items():
+        canonical.setdefault(normalize_text(alias), term)
+    alternatives = sorted(canonical, key=len, reverse=True)
+    pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in alternatives) + r")\b")
+    return pattern, canonical
+
+
+class ProductMatcher:
+    """Reconhece produtos, culturas e ações com padrões compilados uma única vez
+
+    `product_aliases` mapeia apelidos para o nome oficial do produto, e `fuzzy`
+    é consultado para as células sem nenhum produto reconhecido pelo padrão
+    (por exemplo, para tolerar erros de digitação).
+    """
+
+    def __init__(
+        self,
+        products: Iterable[str],
+        cultures: Iterable[str] = CULTURES,
+        actions: Iterable[str] = ACTIONS,
+        product_aliases: Optional[Mapping[str, str]] = None,
+        fuzzy: Optional[Callable[[str], Optional[str]]] = None,
+    ):
+        self._product_pattern, self._products = _compile_vocabulary(products, product_aliases)
+        self._fuzzy = fuzzy
+        self._culture_pattern, self._cultures = _compile_vocabulary(cultures)
+        self._action_pattern, self._actions = _compile_vocabulary(actions)
+        # A saída mantém o formato antigo: cultura e ação em minúsculas
+        self._cultures = {norm: term.lower() for norm, term in self._cultures.items()}
+        self._actions = {norm: term.lower() for norm, term in self._actions.items()}
+
+    def match(self, text: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Devolve (produto, cultura, ação) de uma célula
+
+        O produto vem com o nome oficial quando é reconhecido; caso contrário é
+        devolvido o palpite genérico (que não estará na lista de produtos).
+        """
+        if not text or not str(text).strip():
+            return None, None, None
+
+        normalized = normalize_text(text)
+        product_match = self._product_pattern.search(normalized)
+        culture_match = self._culture_pattern.search(normalized)
+        action_match = self._action_pattern.search(normalized)
+
+        product = self._products[product_match.group(1)] if product_match else None
+        if product is None and self._fuzzy is not None:
+            product = self._fuzzy(text)
+        if product is None:
+            clean_text = EMOJI_PATTERN.sub('', str(text)).strip()
+            guess = GENERIC_PRODUCT_PATTERN.search(clean_text)
+            product = guess.group(1).strip().upper() if guess else None
+
+        culture = self._cultures[culture_match.group(1)] if culture_match else DEFAULT_CULTURE
+        action = self._actions[action_match.group(1)] if action_match else DEFAULT_ACTION
+        return product, culture, action
+
+    def classify_series(self, series: pd.Series) -> pd.DataFrame:
+        """Classifica uma coluna inteira de uma vez
+
+        Devolve um DataFrame com o mesmo índice e as colunas `produto`, `cultura`
+        e `acao`; `produto` fica vazio (NaN) nas linhas sem produto reconhecido.
+        """
+        normalized = normalize_series(series)
+        products = normalized.str.extract(self._product_pattern, expand=False).map(self._products)
+        if self._fuzzy is not None:
+            missing = products.isna() & (normalized != "")
+            if missing.any():
+                products = products.where(~missing, series[missing].map(self._fuzzy))
+        cultures = normalized.str.extract(self._culture_pattern, expand=False).map(self._cultures)
+        actions = normalized.str.extract(self._action_pattern, expand=False).map(self._actions)
+        return pd.DataFrame({
+            "produto": products,
+            "cultura": cultures.fillna(DEFAULT_CULTURE),
+            "acao": actions.fillna(DEFAULT_ACTION),
+        }, index=series.index)
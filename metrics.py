@@ -0,0 +1,156 @@
+"""Instrumentação leve: latência por etapa, contadores e exportação JSON/Prometheus."""
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Set
+
+# Amostras mantidas por etapa para o cálculo dos percentis
+DEFAULT_MAX_SAMPLES = 4096
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_values, quantile: float) -> float:
+    """Percentil por interpolação linear sobre valores já ordenados"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * quantile
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class Histogram:
+    """Distribuição de latências com as últimas `max_samples` amostras"""
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        result = {"count": self.count, "sum": self.total, "max": self.max}
+        for quantile in QUANTILES:
+            result[f"p{int(quantile * 100)}"] = percentile(ordered, quantile)
+        return result
+
+
+class MetricsRegistry:
+    """Registro de métricas do processo, compartilhado entre threads e reruns"""
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._gauges: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Registra a duração de uma execução da etapa"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.max_samples)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """Soma `amount` ao contador `name`"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, float]],
+                           gauges: Iterable[str] = ()) -> None:
+        """Inclui contadores de outro componente (cache, agendador) nas exportações
+
+        Os valores são tratados como totais que só crescem, exceto os campos em
+        `gauges`, que são medidas do momento (como o tamanho do cache).
+        """
+        with self._lock:
+            self._collectors[name] = collect
+            self._gauges.update(f"{name}_{key}" for key in gauges)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Mede o bloco `with` como uma execução da etapa"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def traced(self, stage: str) -> Callable:
+        """Decorador que mede cada chamada da função como uma execução da etapa"""
+        def decorator(fn: Callable) -> Callable:
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(stage):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self) -> None:
+        """Zera latências e contadores próprios (os coletores externos não são afetados)"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual de todas as métricas"""
+        with self._lock:
+            stages = {stage: histogram.summary() for stage, histogram in self._histograms.items()}
+            counters = dict(self._counters)
+            collectors = dict(self._collectors)
+        for name, collect in collectors.items():
+            for key, value in collect().items():
+                counters[f"{name}_{key}"] = value
+        return {"etapas": stages, "contadores": counters}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self, prefix: str = "briefing") -> str:
+        """Exporta no formato de texto do Prometheus"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latência por etapa do gerador de briefings",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, summary in sorted(snapshot["etapas"].items()):
+            for quantile in QUANTILES:
+                value = summary[f"p{int(quantile * 100)}"]
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {summary["count"]}')
+        with self._lock:
+            gauges = set(self._gauges)
+        for name, value in sorted(snapshot["contadores"].items()):
+            if name in gauges:
+                metric, kind = f"{prefix}_{name}", "gauge"
+            else:
+                metric, kind = f"{prefix}_{name}_total", "counter"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Registro padrão do processo
+metrics = MetricsRegistry()
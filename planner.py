@@ -0,0 +1,111 @@
+"""Simulação (dry-run) de um lote: chamadas, tokens e tempo previstos antes de gerar."""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from scheduler import estimate_tokens
+
+# Latência típica de uma chamada ao modelo, em segundos, quando não há medição melhor
+DEFAULT_CALL_LATENCY = 6.0
+
+
+@dataclass
+class BatchPlan:
+    """Resultado da simulação de um lote"""
+    total_linhas: int
+    linhas_com_produto: int
+    linhas_sem_produto: int
+    linhas_ja_concluidas: int
+    linhas_duplicadas: int
+    chamadas_total: int
+    chamadas_economizadas: int
+    chamadas_em_cache: int
+    chamadas_ao_modelo: int
+    tokens_entrada_total: int
+    tokens_por_prompt: Dict[str, int] = field(default_factory=dict)
+    tempo_estimado_s: float = 0.0
+    gargalo: str = ""
+
+
+def estimate_wall_time(
+    calls: int,
+    input_tokens: int,
+    calls_per_row: int,
+    concurrency: int,
+    requests_per_minute: float,
+    tokens_per_minute: float,
+    call_latency: float = DEFAULT_CALL_LATENCY,
+) -> Tuple[float, str]:
+    """Projeta o tempo de execução e indica qual limite domina
+
+    O tempo é o maior entre: chamadas em paralelo limitadas pela concorrência,
+    requisições por minuto e tokens por minuto.
+    """
+    if calls == 0:
+        return 0.0, ""
+
+    in_flight = max(1, concurrency * calls_per_row)
+    limits = {
+        "concorrência": calls * call_latency / in_flight,
+        "requisições por minuto": calls * 60.0 / requests_per_minute,
+        "tokens por minuto": input_tokens * 60.0 / tokens_per_minute,
+    }
+    bottleneck = max(limits, key=limits.get)
+    return limits[bottleneck], bottleneck
+
+
+def plan_batch(
+    total_linhas: int,
+    linhas_sem_produto: int,
+    linhas_ja_concluidas: int,
+    linhas_duplicadas: int,
+    row_prompts: List[Dict[str, str]],
+    is_cached: Callable[[str], bool],
+    concurrency: int,
+    requests_per_minute: float,
+    tokens_per_minute: float,
+    call_latency: float = DEFAULT_CALL_LATENCY,
+) -> BatchPlan:
+    """Simula o lote a partir dos prompts de cada briefing único que ainda será gerado
+
+    `row_prompts` tem um dicionário {tipo do prompt: prompt} por grupo de linhas
+    idênticas; as `linhas_duplicadas` reaproveitam o briefing do seu grupo e não
+    fazem chamadas.
+    """
+    calls_total = 0
+    cached_calls = 0
+    model_calls = 0
+    tokens_total = 0
+    tokens_by_kind: Dict[str, List[int]] = {}
+
+    for prompts in row_prompts:
+        calls_total += len(prompts)
+        for kind, prompt in prompts.items():
+            tokens = estimate_tokens(prompt)
+            tokens_by_kind.setdefault(kind, []).append(tokens)
+            if is_cached(prompt):
+                cached_calls += 1
+            else:
+                model_calls += 1
+                tokens_total += tokens
+
+    calls_per_row = max((len(prompts) for prompts in row_prompts), default=1)
+    wall_time, bottleneck = estimate_wall_time(
+        model_calls, tokens_total, calls_per_row, concurrency,
+        requests_per_minute, tokens_per_minute, call_latency,
+    )
+
+    return BatchPlan(
+        total_linhas=total_linhas,
+        linhas_com_produto=len(row_prompts) + linhas_duplicadas + linhas_ja_concluidas,
+        linhas_sem_produto=linhas_sem_produto,
+        linhas_ja_concluidas=linhas_ja_concluidas,
+        linhas_duplicadas=linhas_duplicadas,
+        chamadas_total=calls_total,
+        chamadas_economizadas=linhas_duplicadas * calls_per_row,
+        chamadas_em_cache=cached_calls,
+        chamadas_ao_modelo=model_calls,
+        tokens_entrada_total=tokens_total,
+        tokens_por_prompt={kind: round(sum(values) / len(values)) for kind, values in tokens_by_kind.items()},
+        tempo_estimado_s=wall_time,
+        gargalo=bottleneck,
+    )
@@ -0,0 +1,160 @@
+"""Modelos de prompt compactos, com orçamento de tokens de entrada e saída."""
+import re
+import textwrap
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from scheduler import estimate_tokens
+
+# Versão dos modelos de prompt; mude sempre que um modelo ou orçamento mudar,
+# para que respostas em cache e briefings já gerados não sejam reaproveitados
+PROMPT_VERSION = "2"
+
+PLATAFORMAS = {
+    "instagram": "Instagram (Feed, Reels, Stories)",
+    "facebook": "Facebook",
+    "linkedin": "LinkedIn",
+    "whatsapp": "WhatsApp Business",
+    "youtube": "YouTube",
+    "portal": "Portal Mais Agro (blog)",
+}
+
+# Plataformas que cada formato principal realmente usa; formatos fora da lista usam todas
+PLATAFORMAS_POR_FORMATO = {
+    "Reels + capa": ["instagram", "facebook"],
+    "Carrossel + stories": ["instagram", "facebook", "linkedin"],
+    "Blog + redes": ["portal", "linkedin", "facebook", "whatsapp"],
+    "Vídeo + stories": ["youtube", "instagram", "whatsapp"],
+    "Multiplataforma": list(PLATAFORMAS),
+}
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    """Limites de tokens de um tipo de prompt"""
+    max_input_tokens: int
+    max_output_tokens: int
+
+
+BUDGETS = {
+    "contexto": PromptBudget(max_input_tokens=600, max_output_tokens=1024),
+    "estrategia": PromptBudget(max_input_tokens=500, max_output_tokens=1536),
+    "combinado": PromptBudget(max_input_tokens=800, max_output_tokens=2560),
+}
+
+# Campos variáveis que podem ser encurtados quando o prompt passa do orçamento
+SHRINKABLE_FIELDS = ("descricao", "conteudo")
+
+CONTEXT_TEMPLATE = """
+    Como redator especializado em agronegócio da Syngenta, elabore um texto contextual discursivo de 3-4 parágrafos para uma pauta de conteúdo.
+
+    Pauta:
+    - Produto: {produto}
+    - Cultura: {cultura}
+    - Ação/tema: {acao}
+    - Mês de publicação: {mes}
+    - Formato principal: {formato}
+    - Conteúdo original: {conteudo}
+    - Descrição do produto: {descricao}
+
+    Instruções:
+    - Tom técnico mas acessível, para produtores rurais
+    - Contextualize o tema para a cultura e a época do ano e explique por que é relevante agora
+    - Considere o público-alvo e os objetivos da comunicação
+    - Incorpore a descrição do produto sem repeti-la literalmente
+    - Linguagem persuasiva mas factual, baseada em dados técnicos
+
+    Formato: texto corrido em português brasileiro
+"""
+
+STRATEGY_TEMPLATE = """
+    Como especialista em mídias sociais para o agronegócio Syngenta, crie uma estratégia de conteúdo:
+
+    PRODUTO: {produto}
+    CULTURA: {cultura}
+    AÇÃO: {acao}
+    CONTEÚDO ORIGINAL: {conteudo}
+    DESCRIÇÃO DO PRODUTO: {descricao}
+
+    PLATAFORMAS:
+    {plataformas}
+
+    PARA CADA PLATAFORMA: tipo de conteúdo, formato ideal (vídeo, carrossel, estático, etc.), tom de voz, CTA específico e melhores práticas.
+
+    Formato: texto claro com uma seção por plataforma
+"""
+
+COMBINED_TEMPLATE = """
+    Como redator e especialista em mídias sociais para o agronegócio da Syngenta, produza as duas seções de um briefing de conteúdo.
+
+    Pauta:
+    - Produto: {produto}
+    - Cultura: {cultura}
+    - Ação/tema: {acao}
+    - Mês de publicação: {mes}
+    - Formato principal: {formato}
+    - Conteúdo original: {conteudo}
+    - Descrição do produto: {descricao}
+
+    Seção "contexto": texto corrido de 3-4 parágrafos, tom técnico mas acessível para produtores rurais. Contextualize o tema para a cultura e a época do ano, explique por que é relevante agora, considere público-alvo e objetivos, e incorpore a descrição do produto sem repeti-la literalmente.
+
+    Seção "estrategia": para {plataformas}, indique tipo de conteúdo, formato ideal, tom de voz, CTA específico e melhores práticas, com uma seção por plataforma.
+
+    Responda apenas com um objeto JSON no formato {{"contexto": "...", "estrategia": "..."}}, com os textos em português brasileiro.
+"""
+
+
+class PromptBudgetError(ValueError):
+    """O prompt não cabe no orçamento de tokens nem depois de encurtar os campos variáveis"""
+
+
+def compact(text: str) -> str:
+    """Remove indentação, espaços repetidos e linhas em branco seguidas"""
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in textwrap.dedent(text).splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber em `max_tokens` (pela mesma estimativa do agendador)"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * 4 - 1)
+    return text[:max_chars].rstrip() + "…"
+
+
+def platforms_for_format(formato_principal: Optional[str]) -> List[str]:
+    """Nomes das plataformas que a estratégia deve cobrir para o formato"""
+    chaves = PLATAFORMAS_POR_FORMATO.get(formato_principal, list(PLATAFORMAS))
+    return [PLATAFORMAS[chave] for chave in chaves]
+
+
+def render(kind: str, template: str, fields: Dict[str, str], shrinkable: Sequence[str] = SHRINKABLE_FIELDS) -> str:
+    """Preenche o modelo e garante que o prompt caiba no orçamento de entrada do tipo
+
+    Se passar do orçamento, os campos de `shrinkable` são encurtados, do maior
+    para o menor, até o prompt caber. Levanta `PromptBudgetError` se nem assim couber.
+    """
+    budget = BUDGETS[kind]
+    fields = {name: compact(str(value)) for name, value in fields.items()}
+    prompt = compact(template.format(**fields))
+
+    for name in sorted(shrinkable, key=lambda name: estimate_tokens(fields[name]), reverse=True):
+        excess = estimate_tokens(prompt) - budget.max_input_tokens
+        if excess <= 0:
+            break
+        fields[name] = truncate_tokens(fields[name], max(0, estimate_tokens(fields[name]) - excess - 1))
+        prompt = compact(template.format(**fields))
+
+    if estimate_tokens(prompt) > budget.max_input_tokens:
+        raise PromptBudgetError(
+            f"Prompt de {kind} com {estimate_tokens(prompt)} tokens excede o orçamento de {budget.max_input_tokens}"
+        )
+    return prompt
+
+
+def generation_config(kind: str, json_mode: bool = False) -> Dict[str, object]:
+    """Configuração de geração com o limite de tokens de saída do tipo de prompt"""
+    config: Dict[str, object] = {"max_output_tokens": BUDGETS[kind].max_output_tokens}
+    if json_mode:
+        config["response_mime_type"] = "application/json"
+    return config
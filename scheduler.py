@@ -0,0 +1,267 @@
+"""Agendador central das chamadas ao modelo, respeitando os limites de cota da API."""
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+# Limites padrão por minuto (ajustáveis conforme o plano da API)
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+# Trechos de mensagem que indicam erro de cota ou indisponibilidade temporária
+RETRYABLE_MARKERS = ("429", "resource has been exhausted", "resource_exhausted", "quota", "rate limit", "503", "unavailable")
+
+
+class RateLimitError(Exception):
+    """Erro de cota que persistiu após todas as novas tentativas"""
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """Indica se o erro é de cota (429) ou indisponibilidade temporária do serviço"""
+    if getattr(exc, "code", None) in (429, 503) or getattr(exc, "status_code", None) in (429, 503):
+        return True
+    if type(exc).__name__ in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable"):
+        return True
+    message = str(exc).lower()
+    return any(marker in message for marker in RETRYABLE_MARKERS)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa grosseira de tokens (cerca de 4 caracteres por token)"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Balde de fichas reabastecido continuamente a `rate_per_minute` fichas por minuto"""
+
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.rate_per_minute = rate_per_minute
+        self.capacity = rate_per_minute
+        self._tokens = rate_per_minute
+        self._updated_at = clock()
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        """Altera o limite sem perder as fichas já acumuladas"""
+        with self._lock:
+            self._refill()
+            self.rate_per_minute = rate_per_minute
+            self.capacity = rate_per_minute
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_minute / 60.0)
+
+    def reserve(self, amount: float = 1) -> float:
+        """Reserva `amount` fichas e devolve quantos segundos esperar até poder usá-las"""
+        with self._lock:
+            self._refill()
+            amount = min(amount, self.capacity)
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * 60.0 / self.rate_per_minute
+
+
+class SharedTokenBucket:
+    """Balde de fichas guardado em SQLite, compartilhado por todos os processos que usam o mesmo arquivo
+
+    Tem a mesma interface de `TokenBucket`. O limite também fica no arquivo:
+    `set_rate` em um processo vale para todos, e `rate_per_minute` só é usado
+    na criação do balde.
+    """
+
+    def __init__(self, path: str, name: str, rate_per_minute: float, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS baldes ("
+            "nome TEXT PRIMARY KEY, taxa REAL NOT NULL, fichas REAL NOT NULL, atualizado_em REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO baldes (nome, taxa, fichas, atualizado_em) VALUES (?, ?, ?, ?)",
+            (name, rate_per_minute, rate_per_minute, clock()),
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Tuple[float, float]]:
+        """Bloqueia o balde para escrita e devolve (taxa, fichas já reabastecidas)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rate, tokens, updated_at = self._conn.execute(
+                    "SELECT taxa, fichas, atualizado_em FROM baldes WHERE nome = ?", (self.name,)
+                ).fetchone()
+                elapsed = max(0.0, self._clock() - updated_at)
+                yield rate, min(rate, tokens + elapsed * rate / 60.0)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _save(self, rate: float, tokens: float) -> None:
+        self._conn.execute(
+            "UPDATE baldes SET taxa = ?, fichas = ?, atualizado_em = ? WHERE nome = ?",
+            (rate, tokens, self._clock(), self.name),
+        )
+
+    @property
+    def rate_per_minute(self) -> float:
+        with self._lock:
+            return self._conn.execute("SELECT taxa FROM baldes WHERE nome = ?", (self.name,)).fetchone()[0]
+
+    @property
+    def capacity(self) -> float:
+        return self.rate_per_minute
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        """Altera o limite para todos os processos sem perder as fichas já acumuladas"""
+        with self._transaction() as (_, tokens):
+            self._save(rate_per_minute, min(tokens, rate_per_minute))
+
+    def reserve(self, amount: float = 1) -> float:
+        """Reserva `amount` fichas e devolve quantos segundos esperar até poder usá-las"""
+        with self._transaction() as (rate, tokens):
+            tokens -= min(amount, rate)
+            self._save(rate, tokens)
+        if tokens >= 0:
+            return 0.0
+        return -tokens * 60.0 / rate
+
+
+class RequestScheduler:
+    """Controla requisições e tokens por minuto, com novas tentativas e backoff exponencial
+
+    Com `shared_state_path`, a cota fica em um arquivo SQLite e é dividida entre
+    todos os processos que usam o mesmo arquivo (por exemplo, os workers da fila).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        sleep: Callable[[float], None] = time.sleep,
+        shared_state_path: Optional[str] = None,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        # A cota compartilhada faz transações no SQLite, que podem esperar pelo lock do arquivo
+        self._shared_quota = bool(shared_state_path)
+        if shared_state_path:
+            self._requests = SharedTokenBucket(shared_state_path, "requisicoes", requests_per_minute)
+            self._tokens = SharedTokenBucket(shared_state_path, "tokens", tokens_per_minute)
+        else:
+            self._requests = TokenBucket(requests_per_minute)
+            self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+
+    @property
+    def requests_per_minute(self) -> float:
+        return self._requests.rate_per_minute
+
+    @property
+    def tokens_per_minute(self) -> float:
+        return self._tokens.rate_per_minute
+
+    def update_limits(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None) -> None:
+        """Ajusta os limites de cota em tempo de execução"""
+        if requests_per_minute and requests_per_minute != self._requests.rate_per_minute:
+            self._requests.set_rate(requests_per_minute)
+        if tokens_per_minute and tokens_per_minute != self._tokens.rate_per_minute:
+            self._tokens.set_rate(tokens_per_minute)
+
+    def _reserve_quota(self, tokens: int) -> float:
+        delay = max(self._requests.reserve(1), self._tokens.reserve(tokens))
+        with self._lock:
+            self.calls += 1
+            if delay > 0:
+                self.throttled_seconds += delay
+        return delay
+
+    def _register_retry(self, exc: Exception, attempt: int) -> None:
+        """Conta a nova tentativa, ou levanta o erro se ele não deve ser repetido"""
+        if not is_retryable_error(exc):
+            raise exc
+        with self._lock:
+            if attempt > self.max_retries:
+                self.failures += 1
+            else:
+                self.retries += 1
+        if attempt > self.max_retries:
+            raise RateLimitError(
+                f"Limite de cota persistiu após {self.max_retries} novas tentativas: {exc}"
+            ) from exc
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Espera da tentativa `attempt` (a partir de 1), com jitter completo"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, fn: Callable[[], Any], tokens: int = 1) -> Any:
+        """Executa `fn` respeitando a cota, repetindo em caso de erro 429 ou serviço indisponível"""
+        attempt = 0
+        while True:
+            delay = self._reserve_quota(tokens)
+            if delay > 0:
+                self._sleep(delay)
+            try:
+                return fn()
+            except Exception as exc:
+                attempt += 1
+                self._register_retry(exc, attempt)
+                self._sleep(self.backoff_delay(attempt))
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], tokens: int = 1) -> Any:
+        """Versão assíncrona de `call`: as esperas não bloqueiam o laço de eventos"""
+        attempt = 0
+        while True:
+            if self._shared_quota:
+                # Fora do laço de eventos, para a espera pelo SQLite não travar as outras corrotinas
+                delay = await asyncio.to_thread(self._reserve_quota, tokens)
+            else:
+                delay = self._reserve_quota(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await fn()
+            except Exception as exc:
+                attempt += 1
+                self._register_retry(exc, attempt)
+                await asyncio.sleep(self.backoff_delay(attempt))
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores de chamadas, novas tentativas e tempo de espera por cota"""
+        with self._lock:
+            return {
+                "chamadas": self.calls,
+                "novas_tentativas": self.retries,
+                "falhas": self.failures,
+                "segundos_em_espera": round(self.throttled_seconds, 2),
+            }
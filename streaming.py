@@ -0,0 +1,142 @@
+"""Leitura do CSV em blocos e escrita incremental do ZIP de briefings."""
+import os
+import threading
+import zipfile
+from typing import IO, Iterator, List, Tuple
+
+import pandas as pd
+
+# Linhas lidas do CSV por vez
+DEFAULT_CHUNKSIZE = 500
+# Briefings acumulados em memória antes de serem gravados no ZIP em disco
+DEFAULT_FLUSH_EVERY = 25
+
+
+def read_csv_preview(file: IO, nrows: int = 5) -> pd.DataFrame:
+    """Lê apenas as primeiras linhas do CSV, para prévia e escolha da coluna"""
+    file.seek(0)
+    preview = pd.read_csv(file, nrows=nrows)
+    file.seek(0)
+    return preview
+
+
+def iter_csv_chunks(file: IO, column: str, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.Series]:
+    """Percorre uma única coluna do CSV em blocos de `chunksize` linhas
+
+    Cada bloco é uma Series de textos (células vazias viram "") com o índice
+    original da linha no arquivo.
+    """
+    file.seek(0)
+    reader = pd.read_csv(file, usecols=[column], chunksize=chunksize, dtype=str)
+    for chunk in reader:
+        yield chunk[column].fillna("")
+
+
+class IncrementalZip:
+    """ZIP em disco que recebe os briefings à medida que ficam prontos.
+
+    As entradas são gravadas em grupos de `flush_every`; entre um grupo e outro
+    o arquivo é sempre um ZIP válido, que pode ser baixado parcialmente.
+    """
+
+    def __init__(self, path: str, flush_every: int = DEFAULT_FLUSH_EVERY):
+        self.path = path
+        self.flush_every = flush_every
+        self._pending: List[Tuple[str, str]] = []
+        self._names = set()
+        self._written = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path):
+            zipfile.ZipFile(path, "w").close()
+        else:
+            with zipfile.ZipFile(path) as zip_file:
+                self._names.update(zip_file.namelist())
+                self._written = len(self._names)
+
+    def add(self, name: str, text: str) -> None:
+        """Adiciona um briefing; entradas com nome repetido são ignoradas"""
+        with self._lock:
+            if name in self._names:
+                return
+            self._names.add(name)
+            self._pending.append((name, text))
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+
+    def replace(self, name: str, text: str) -> None:
+        """Grava a entrada no disco, substituindo a versão anterior se ela já existir
+
+        Como o formato ZIP não permite remover entradas, o arquivo é reescrito
+        sem a versão anterior; por isso é feito só para entradas que mudam entre
+        execuções, como o relatório de alterações.
+        """
+        with self._lock:
+            self._remove({name})
+            self._names.add(name)
+            self._pending.append((name, text))
+            self._flush()
+
+    def remove(self, names) -> None:
+        """Tira entradas do ZIP, reescrevendo o arquivo uma única vez para todas elas"""
+        with self._lock:
+            self._remove(set(names))
+
+    def _remove(self, names) -> None:
+        self._pending = [(pending, content) for pending, content in self._pending if pending not in names]
+        self._flush()
+        removidas = names & self._names
+        if not removidas:
+            return
+        temp_path = self.path + ".tmp"
+        with zipfile.ZipFile(self.path) as origem, \
+                zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as destino:
+            for info in origem.infolist():
+                if info.filename not in removidas:
+                    destino.writestr(info, origem.read(info))
+        os.replace(temp_path, self.path)
+        self._names -= removidas
+        self._written -= len(removidas)
+
+    def flush(self) -> None:
+        """Grava no disco os briefings ainda em memória"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        with zipfile.ZipFile(self.path, "a", zipfile.ZIP_DEFLATED) as zip_file:
+            for name, text in self._pending:
+                zip_file.writestr(name, text)
+        self._written += len(self._pending)
+        self._pending.clear()
+
+    @property
+    def written(self) -> int:
+        """Quantidade de briefings já gravados no disco"""
+        return self._written
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def read(self, name: str) -> str:
+        """Lê um único briefing do ZIP"""
+        with self._lock:
+            for pending_name, text in self._pending:
+                if pending_name == name:
+                    return text
+            with zipfile.ZipFile(self.path) as zip_file:
+                return zip_file.read(name).decode("utf-8")
+
+    def read_bytes(self) -> bytes:
+        """Conteúdo atual do ZIP em disco, para download"""
+        with self._lock:
+            with open(self.path, "rb") as zip_stream:
+                return zip_stream.read()
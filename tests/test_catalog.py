@@ -0,0 +1,51 @@
+"""Regressões da busca aproximada de produtos no catálogo."""
+import pandas as pd
+import pytest
+
+from catalog import ProductCatalog
+
+# Frases reais de calendários que não citam produto nenhum
+FRASES_SEM_PRODUTO = [
+    "ponta - soja",
+    "pontas - soja",
+    "alado - soja",
+    "alada - milho",
+    "o verdadeiro manejo - soja",
+    "verdadeiros resultados - soja",
+    "verdadeira - soja",
+    "influxo de pragas - soja",
+    "influxo - soja",
+    "certo - soja",
+    "reverbera - soja",
+    "calar - soja",
+]
+
+# Nomes com erro de digitação que devem continuar reconhecidos
+ERROS_DE_DIGITACAO = [
+    ("megafl - soja", "MEGAFOL"),
+    ("spontta - soja", "SPONTA"),
+    ("verdadro - soja", "VERDADERO"),
+    ("alde - soja", "ALADE"),
+    ("certanno - soja", "CERTANO"),
+    ("frondio - soja", "FRONDEO"),
+    ("engeo plen s - milho", "ENGEO PLENO S"),
+    ("fortenzza elite - soja - reforço", "FORTENZA ELITE"),
+    ("mirvis duo - algodão", "MIRAVIS DUO"),
+]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return ProductCatalog()
+
+
+@pytest.mark.parametrize("texto", FRASES_SEM_PRODUTO)
+def test_frase_comum_nao_vira_produto(catalog, texto):
+    assert catalog.fuzzy_match(texto) is None
+    assert pd.isna(catalog.matcher.classify_series(pd.Series([texto]))["produto"].iloc[0])
+
+
+@pytest.mark.parametrize("texto, produto", ERROS_DE_DIGITACAO)
+def test_erro_de_digitacao_reconhecido(catalog, texto, produto):
+    assert catalog.fuzzy_match(texto) == produto
+    assert catalog.matcher.classify_series(pd.Series([texto]))["produto"].iloc[0] == produto
@@ -0,0 +1,137 @@
+"""Workers em segundo plano que processam os lotes da fila (job_queue.JobQueue).
+
+Cada worker é um processo que pega o próximo pedido da fila, respeitando a
+justiça entre usuários, e o processa com `core.process_calendar`. Todos usam o
+mesmo diretório de cache, então dividem a cota da API, o cache de respostas e
+o diário de lotes com o app. Exemplo:
+
+    python worker.py --processos 2
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import date
+
+import core
+from job_queue import CANCELADO, CONCLUIDO, FALHOU, INCOMPLETO
+from metrics import metrics
+
+# Intervalo entre consultas à fila vazia e entre sinais de vida, em segundos
+DEFAULT_POLL_INTERVAL = 2.0
+HEARTBEAT_INTERVAL = 30.0
+# Intervalo mínimo entre publicações das métricas do worker durante um lote
+METRICS_INTERVAL = 5.0
+
+
+def process_request(pedido) -> None:
+    """Processa um pedido já entregue a este worker e registra o resultado na fila"""
+    fila = core.get_job_queue()
+    pedido_id = pedido["id"]
+    parametros = pedido["parametros"]
+    cancel_event = threading.Event()
+    finished = threading.Event()
+
+    def heartbeat():
+        # Lotes com linhas demoradas continuam dando sinal de vida entre uma linha e outra
+        while not finished.wait(HEARTBEAT_INTERVAL):
+            fila.touch(pedido_id)
+
+    publicado = {"em": 0.0}
+
+    def progresso(concluidos, total, zip_saida):
+        if fila.update_progress(pedido_id, concluidos, total):
+            cancel_event.set()
+        if time.monotonic() - publicado["em"] >= METRICS_INTERVAL:
+            publicado["em"] = time.monotonic()
+            fila.publish_metrics(pedido["worker"], metrics.snapshot())
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        with open(fila.csv_path(pedido_id), "rb") as csv_file:
+            file_bytes = csv_file.read()
+        relatorio = core.process_calendar(
+            file_bytes,
+            pedido["nome_arquivo"],
+            parametros["coluna"],
+            date.fromisoformat(parametros["data"]),
+            parametros["formato"],
+            combined=parametros["combinado"],
+            max_workers=parametros["concorrencia"],
+            on_progress=progresso,
+            use_async=parametros["assincrono"],
+            cancel_event=cancel_event,
+        )
+    except Exception as e:
+        fila.finish(pedido_id, FALHOU, erro=str(e))
+        return
+    finally:
+        finished.set()
+        # As métricas ficam neste processo; o app as lê da fila
+        fila.publish_metrics(pedido["worker"], metrics.snapshot())
+
+    status = CANCELADO if relatorio.cancelado else INCOMPLETO if relatorio.falhas else CONCLUIDO
+    fila.update_progress(pedido_id, len(relatorio.briefings), relatorio.linhas_com_produto)
+    fila.finish(pedido_id, status, resumo=relatorio.to_summary())
+
+
+def run_worker(nome: str, poll_interval: float = DEFAULT_POLL_INTERVAL, once: bool = False) -> None:
+    """Laço de um worker: pega pedidos até a fila esvaziar (com `once`) ou para sempre"""
+    if core.configure_backend() is None:
+        print(f"[{nome}] Erro: defina GEMINI_API_KEY (ou BRIEFING_BACKEND=stub).", file=sys.stderr)
+        return
+
+    fila = core.get_job_queue()
+    while True:
+        pedido = fila.claim(nome)
+        if pedido is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        print(f"[{nome}] Pedido {pedido['id']} ({pedido['usuario']}, lote {pedido['job_id']})", file=sys.stderr)
+        process_request(pedido)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Processa os lotes de briefings enviados para a fila.")
+    parser.add_argument("--processos", type=int, default=int(os.getenv("BRIEFING_WORKERS", "2")),
+                        help="Quantidade de workers (processos) em paralelo")
+    parser.add_argument("--intervalo", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Segundos entre consultas à fila vazia")
+    parser.add_argument("--uma-vez", action="store_true", help="Encerra quando a fila esvaziar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    prefixo = f"{socket.gethostname()}-{os.getpid()}"
+    if args.processos <= 1:
+        run_worker(f"{prefixo}-0", args.intervalo, args.uma_vez)
+        return 0
+
+    # SIGTERM (enviado pelo app ao trocar ou encerrar o grupo) encerra também os workers filhos
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # "spawn" evita herdar conexões SQLite e threads do processo principal
+    contexto = multiprocessing.get_context("spawn")
+    processos = [
+        contexto.Process(target=run_worker, args=(f"{prefixo}-{i}", args.intervalo, args.uma_vez), daemon=True)
+        for i in range(args.processos)
+    ]
+    for processo in processos:
+        processo.start()
+    try:
+        for processo in processos:
+            processo.join()
+    except KeyboardInterrupt:
+        for processo in processos:
+            processo.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())